@@ -5,11 +5,11 @@ Contains class BaseModel
 
 from datetime import datetime
 import models
+from models.identifiers import new_id
 from os import getenv
 import sqlalchemy
 from sqlalchemy import Column, String, DateTime
 from sqlalchemy.ext.declarative import declarative_base
-import uuid
 
 time = "%Y-%m-%dT%H:%M:%S.%f"
 
@@ -24,28 +24,39 @@ class BaseModel:
     if models.storage_t == "db":
         id = Column(String(60), primary_key=True)
         created_at = Column(DateTime, default=datetime.utcnow)
-        updated_at = Column(DateTime, default=datetime.utcnow)
+        updated_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     def __init__(self, *args, **kwargs):
         """Initialization of the base model"""
+        # a new object is not stored yet, so skip the file storage hook
+        assign = super().__setattr__
         if kwargs:
             for key, value in kwargs.items():
                 if key != "__class__":
-                    setattr(self, key, value)
+                    assign(key, value)
             if kwargs.get("created_at", None) and type(self.created_at) is str:
-                self.created_at = datetime.strptime(kwargs["created_at"], time)
+                assign("created_at",
+                       datetime.strptime(kwargs["created_at"], time))
             else:
-                self.created_at = datetime.utcnow()
+                assign("created_at", datetime.utcnow())
             if kwargs.get("updated_at", None) and type(self.updated_at) is str:
-                self.updated_at = datetime.strptime(kwargs["updated_at"], time)
+                assign("updated_at",
+                       datetime.strptime(kwargs["updated_at"], time))
             else:
-                self.updated_at = datetime.utcnow()
+                assign("updated_at", datetime.utcnow())
             if kwargs.get("id", None) is None:
-                self.id = str(uuid.uuid4())
+                assign("id", new_id())
         else:
-            self.id = str(uuid.uuid4())
-            self.created_at = datetime.utcnow()
-            self.updated_at = self.created_at
+            assign("id", new_id())
+            assign("created_at", datetime.utcnow())
+            assign("updated_at", self.created_at)
+
+    if models.storage_t != "db":
+        def __setattr__(self, name, value):
+            """sets an attribute and reports the change to file storage"""
+            old = getattr(self, name, None) if name.endswith("_id") else None
+            super().__setattr__(name, value)
+            models.storage.changed(self, name, old)
 
     def __str__(self):
         """String representation of the BaseModel class"""
@@ -0,0 +1,201 @@
+#!/usr/bin/python3
+"""
+Contains the caches used by the storage engines
+"""
+
+import threading
+from collections import OrderedDict
+from itertools import count
+from time import monotonic
+
+_clock = count(1)
+
+
+def parse_limits(spec):
+    """returns the per-class limits described by "Class:size[:ttl],..."
+
+    A missing or empty ttl keeps the entries until they are evicted.
+    """
+    limits = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, size, ttl = (item.strip().split(":") + [""])[:3]
+        limits[name] = (int(size), float(ttl) if ttl else None)
+    return limits
+
+
+def query_key(*args):
+    """returns args as a hashable cache key, or None if they are not
+
+    Lists become tuples and dicts become sorted tuples of their items.
+    """
+    key = tuple(tuple(sorted(arg.items())) if type(arg) is dict else
+                tuple(arg) if type(arg) is list else arg for arg in args)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class LRUCache:
+    """a bounded mapping that forgets the least recently used entries
+
+    Entries older than ttl seconds are dropped when they are looked up,
+    and putting more than maxsize entries evicts the least recently used.
+    """
+
+    def __init__(self, maxsize=128, ttl=None):
+        """Instantiate an empty LRUCache"""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """returns the value cached under key, or default"""
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and self.ttl is not None and \
+                    monotonic() - entry[1] > self.ttl:
+                del self.__entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """caches value under key, evicting the oldest entries if full"""
+        with self.__lock:
+            self.__entries[key] = (value, monotonic())
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        """forgets key, if it is cached"""
+        with self.__lock:
+            self.__entries.pop(key, None)
+
+    def clear(self):
+        """forgets every entry"""
+        with self.__lock:
+            self.__entries.clear()
+
+    def __len__(self):
+        """returns the number of cached entries"""
+        return len(self.__entries)
+
+    def stats(self):
+        """returns the counters and the limits of the cache"""
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "size": len(self),
+                "maxsize": self.maxsize, "ttl": self.ttl}
+
+
+class IdentityCache:
+    """one LRUCache of objects per class, keyed by "<class name>.<id>"
+
+    Objects of the classes without a cache are never stored.
+    """
+
+    def __init__(self, limits=None):
+        """Instantiate the caches, limits maps class names to (size, ttl)"""
+        self.__caches = {name: LRUCache(size, ttl)
+                         for name, (size, ttl) in (limits or {}).items()}
+
+    def __bool__(self):
+        """tells whether any class is cached"""
+        return bool(self.__caches)
+
+    def __cache(self, key):
+        """returns the cache of the class of key, or None"""
+        return self.__caches.get(key.partition(".")[0])
+
+    def get(self, key):
+        """returns the object cached under key, or None"""
+        cache = self.__cache(key)
+        return None if cache is None else cache.get(key)
+
+    def put(self, key, obj):
+        """caches obj under key if its class is cached"""
+        cache = self.__cache(key)
+        if cache is not None:
+            cache.put(key, obj)
+
+    def invalidate(self, key):
+        """forgets the object cached under key"""
+        cache = self.__cache(key)
+        if cache is not None:
+            cache.pop(key)
+
+    def clear(self):
+        """forgets every cached object"""
+        for cache in self.__caches.values():
+            cache.clear()
+
+    def stats(self):
+        """returns the counters of every class cache"""
+        return {name: cache.stats() for name, cache in self.__caches.items()}
+
+
+class ResultCache:
+    """one LRUCache of query results per class, dropped when it changes
+
+    Each result is stored with the version of its class, and bump() gives
+    the class a new version whenever one of its objects is written, so a
+    result is only returned while nothing it depends on has changed. The
+    versions may be shared with other caches over the same objects.
+    """
+
+    def __init__(self, limits=None, versions=None):
+        """Instantiate the caches, limits maps class names to (size, ttl)"""
+        self.__caches = {name: LRUCache(size, ttl)
+                         for name, (size, ttl) in (limits or {}).items()}
+        self.__versions = {} if versions is None else versions
+        self.hits = 0
+        self.misses = 0
+
+    def __bool__(self):
+        """tells whether any class is cached"""
+        return bool(self.__caches)
+
+    def version(self, name):
+        """returns the current version of class name"""
+        return self.__versions.get(name, 0)
+
+    def bump(self, name):
+        """gives class name a new version, dropping its cached results"""
+        self.__versions[name] = next(_clock)
+
+    def get(self, name, args):
+        """returns the result cached for args, or None if stale or absent"""
+        cache = self.__caches.get(name)
+        if cache is None:
+            return None
+        entry = cache.get(args)
+        if entry is None or entry[0] != self.version(name):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, name, args, result, version):
+        """caches result, computed while class name was at version"""
+        cache = self.__caches.get(name)
+        if cache is not None and version == self.version(name):
+            cache.put(args, (version, result))
+
+    def stats(self):
+        """returns the counters of the caches"""
+        return {"hits": self.hits, "misses": self.misses,
+                "classes": {name: len(cache)
+                            for name, cache in self.__caches.items()}}
@@ -2,11 +2,21 @@
 """
 Contains the class DBStorage
 """
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, cycle
 from os import getenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy import create_engine, event, func, inspect, select
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
 
 from models.base_model import Base
+from models.engine.cache import IdentityCache, ResultCache, parse_limits
+from models.engine.cache import query_key
+from models.engine.events import Event, EventBus
+from models.engine.pool import TimedQueuePool
 from models.user import User
 from models.state import State
 from models.city import City
@@ -24,62 +34,456 @@ classes = {
 }
 
 
+class RoutingSession(Session):
+    """A Session that writes to the primary and reads from the replicas
+
+    Reads go to the replicas in turn. Once the session has written, it
+    reads from the primary as well until it is closed, so that it always
+    sees its own writes.
+    """
+
+    def __init__(self, replicas=None, **kwargs):
+        """Instantiate a RoutingSession reading from the replicas cycle"""
+        super().__init__(**kwargs)
+        self.__replicas = replicas
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        """Return the engine that should run clause"""
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.info["primary"] = True
+        if self.__replicas is None or self.info.get("primary"):
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        return next(self.__replicas)
+
+    def close(self):
+        """Close the session and go back to reading from the replicas"""
+        super().close()
+        self.info.pop("primary", None)
+
+
 class DBStorage:
-    """Interacts with the MySQL database"""
+    """Interacts with the MySQL database
+
+    rows() without a class fetches the classes concurrently, one pooled
+    connection each, when HBNB_MYSQL_FETCH_WORKERS is set above 1 and the
+    session holds no unflushed changes. all() always runs one query per
+    class in the session, as building the objects anywhere else costs
+    more than the round trips saved.
+
+    With HBNB_MYSQL_REPLICA_HOSTS set, reads are spread over the replicas
+    and writes go to HBNB_MYSQL_HOST, see RoutingSession.
+
+    HBNB_MYSQL_CACHE ("Class:size[:ttl],...") keeps the columns of the
+    objects returned by get() for the classes it lists, see IdentityCache.
+    They are forgotten when new(), delete() or a flush touches them, and
+    relationships are always loaded again.
+    HBNB_RESULT_CACHE, in the same format, keeps the columns of the
+    results of all(cls) and query() without load until an object of their
+    class is written, see ResultCache.
+    """
     __engine = None
     __session = None
+    __factory = None
 
     def __init__(self):
         """Instantiate a DBStorage object"""
-        user = getenv('HBNB_MYSQL_USER')
-        pwd = getenv('HBNB_MYSQL_PWD')
         host = getenv('HBNB_MYSQL_HOST')
-        db = getenv('HBNB_MYSQL_DB')
+        replicas = getenv('HBNB_MYSQL_REPLICA_HOSTS', '')
         env = getenv('HBNB_ENV')
+        self.__workers = int(getenv('HBNB_MYSQL_FETCH_WORKERS', 1))
+        self.__bulk = []
+        self.__chunk = 500
+        self.__cache = IdentityCache(
+            parse_limits(getenv('HBNB_MYSQL_CACHE', '')))
+        self.__results = ResultCache(
+            parse_limits(getenv('HBNB_RESULT_CACHE', '')))
+        self.__events = EventBus()
+        self.__saved = []
 
-        self.__engine = create_engine(
-            f"mysql+mysqldb://{user}:{pwd}@{host}/{db}",
-            pool_pre_ping=True
-        )
+        self.__engine = self._create_engine(host)
+        self.__replicas = [self._create_engine(replica.strip())
+                           for replica in replicas.split(',')
+                           if replica.strip()]
 
         if env == "test":
             Base.metadata.drop_all(self.__engine)
 
+    @property
+    def events(self):
+        """The EventBus told about the changes made through this storage"""
+        return self.__events
+
+    def _create_engine(self, host):
+        """Create the engine connecting to the MySQL server on host"""
+        user = getenv('HBNB_MYSQL_USER')
+        pwd = getenv('HBNB_MYSQL_PWD')
+        db = getenv('HBNB_MYSQL_DB')
+        return create_engine(
+            f"mysql+mysqldb://{user}:{pwd}@{host}/{db}",
+            poolclass=TimedQueuePool,
+            pool_size=int(getenv('HBNB_MYSQL_POOL_SIZE', 5)),
+            max_overflow=int(getenv('HBNB_MYSQL_MAX_OVERFLOW', 10)),
+            pool_recycle=int(getenv('HBNB_MYSQL_POOL_RECYCLE', -1)),
+            pool_timeout=float(getenv('HBNB_MYSQL_POOL_TIMEOUT', 30)),
+            pool_pre_ping=getenv('HBNB_MYSQL_PRE_PING', '1') != '0'
+        )
+
     def all(self, cls=None):
         """Query objects from the current database session"""
         new_dict = {}
         for clss in classes.values():
             if cls is None or cls == clss or cls == clss.__name__:
-                objs = self.__session.query(clss).all()
+                objs = self.__cached(clss.__name__, ("all",),
+                                     self.__session.query(clss).all)
                 for obj in objs:
                     key = f"{obj.__class__.__name__}.{obj.id}"
                     new_dict[key] = obj
         return new_dict
 
+    def __cached(self, name, args, fetch):
+        """Return fetch(), or its cached result while name is unchanged
+
+        Only the columns of the objects are cached, see __snapshot(). The
+        cache is skipped while the session holds changes not flushed yet,
+        which fetch() would autoflush and return.
+        """
+        if not self.__results or self.__pending():
+            return fetch()
+        objs = self.__results.get(name, args)
+        if objs is not None:
+            return [self.__merge(obj) for obj in objs]
+        version = self.__results.version(name)
+        objs = fetch()
+        if not any(map(self.__stale, objs)):
+            self.__results.put(name, args, list(map(self.__snapshot, objs)),
+                               version)
+        return objs
+
+    def rows(self, cls=None):
+        """Query plain rows, without building objects, keyed like all()"""
+        new_dict = {}
+        if cls is None and self.__concurrent():
+            fetched = zip(classes, self.__fetch(self.__load_rows))
+        else:
+            fetched = ((name, self.__session.execute(
+                select(clss.__table__)).all())
+                for name, clss in classes.items()
+                if cls is None or cls == clss or cls == name)
+        for name, rows in fetched:
+            for row in rows:
+                new_dict[f"{name}.{row.id}"] = row
+        return new_dict
+
+    def __concurrent(self):
+        """Tell whether every class can be fetched on its own connection"""
+        return self.__workers > 1 and \
+            not self.__session.info.get("primary") and not self.__pending()
+
+    def __fetch(self, fetch):
+        """Run fetch for every class at once and return the results"""
+        workers = min(self.__workers, len(classes))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(fetch, classes.values()))
+
+    def __load_rows(self, clss):
+        """Load the clss rows on a connection of their own"""
+        with self.__factory() as session:
+            return session.execute(select(clss.__table__)).all()
+
+    def get(self, cls, id):
+        """Return the cls object with primary key id, or None"""
+        if type(cls) is str:
+            cls = classes.get(cls)
+        if cls is None or id is None:
+            return None
+        key = f"{cls.__name__}.{id}"
+        if not self.__cache or self.__pending() or \
+                identity_key(cls, id) in self.__session.identity_map:
+            return self.__session.get(cls, id)
+        obj = self.__cache.get(key)
+        if obj is not None:
+            return self.__merge(obj)
+        obj = self.__session.get(cls, id)
+        if obj is not None and not self.__stale(obj):
+            self.__cache.put(key, self.__snapshot(obj))
+        else:
+            self.__cache.invalidate(key)
+        return obj
+
+    @staticmethod
+    def __stale(obj):
+        """Tell whether obj has changes the database does not have yet"""
+        state = inspect(obj)
+        return state.modified or state.deleted or state.was_deleted
+
+    def __pending(self):
+        """Tell whether the session holds changes not flushed yet"""
+        session = self.__session
+        return bool(session.new or session.dirty or session.deleted)
+
+    def __merge(self, copy):
+        """Return the session's instance for a cached copy
+
+        An instance the session already holds is returned as it is, so
+        that its changes are never overwritten by the cached columns.
+        """
+        held = self.__session.identity_map.get(inspect(copy).key)
+        if held is not None:
+            return held
+        return self.__session.merge(copy, load=False)
+
+    @staticmethod
+    def __snapshot(obj):
+        """Copy the loaded columns of obj into a new detached object
+
+        The caches keep these copies rather than obj, so that merging one
+        into a later session never brings back the relationships loaded
+        on obj, which the caches are not told about when they change.
+        """
+        state = inspect(obj)
+        copy = state.mapper.class_manager.new_instance()
+        for key in state.mapper.column_attrs.keys():
+            if key in state.dict:
+                set_committed_value(copy, key, state.dict[key])
+        make_transient_to_detached(copy)
+        return copy
+
+    def cache_stats(self):
+        """Return the hit and miss counters of the caches"""
+        stats = self.__cache.stats()
+        if self.__results:
+            stats["results"] = self.__results.stats()
+        return stats
+
+    def count(self, cls=None):
+        """Count the objects of cls, or of every class, in SQL"""
+        total = 0
+        for clss in classes.values():
+            if cls is None or cls == clss or cls == clss.__name__:
+                total += self.__session.query(func.count(clss.id)).scalar()
+        return total
+
+    def iter(self, cls=None, batch_size=1000):
+        """Yield objects one at a time, fetching batch_size rows at once"""
+        for clss in classes.values():
+            if cls is None or cls == clss or cls == clss.__name__:
+                yield from self.__session.query(clss).yield_per(batch_size)
+
+    def query(self, cls, where=None, order_by=None, limit=None, offset=0,
+              load=None):
+        """Query the cls rows matching where, sorted and paged in SQL
+
+        load names the relationships to load along, see __options();
+        such queries are never cached, as their relationships may change
+        without their class being written.
+        """
+        if type(cls) is str:
+            cls = classes[cls]
+        if type(order_by) is str:
+            order_by = [order_by]
+        args = query_key("query", where, order_by, limit, offset)
+        query = self.__session.query(cls).filter_by(**(where or {}))
+        query = query.options(*self.__options(cls, load))
+        for attr in order_by or ():
+            column = getattr(cls, attr.lstrip("-"))
+            query = query.order_by(column.desc() if attr.startswith("-")
+                                   else column)
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        if args is None or load is not None:
+            return query.all()
+        return self.__cached(cls.__name__, args, query.all)
+
+    def prefetch(self, objs, *paths, strategy="selectin"):
+        """Load the relationship paths of objs in a bounded number of queries
+
+        Each class of objs costs one query per chunk of ids, plus one per
+        step of every path when strategy is "selectin".
+        """
+        objs = list(objs)
+        ids = {}
+        for obj in objs:
+            ids.setdefault(type(obj), []).append(obj.id)
+        for clss, clss_ids in ids.items():
+            options = self.__options(clss, {path: strategy for path in paths})
+            for start in range(0, len(clss_ids), self.__chunk):
+                chunk = clss_ids[start:start + self.__chunk]
+                self.__session.query(clss).filter(
+                    clss.id.in_(chunk)).options(*options).all()
+        return objs
+
+    def __options(self, cls, load):
+        """Build the loader options for load
+
+        load is a dotted relationship path such as "cities.places", a
+        list of them, or a dict mapping each path to "selectin" (the
+        default) or "joined".
+        """
+        if load is None:
+            return []
+        if type(load) is str:
+            load = [load]
+        if type(load) is not dict:
+            load = {path: "selectin" for path in load}
+        options = []
+        for path, strategy in load.items():
+            if strategy not in ("selectin", "joined"):
+                raise ValueError(f"unknown loading strategy {strategy!r}")
+            option, target = None, cls
+            for attr in path.split("."):
+                prop = getattr(target, attr)
+                if option is None:
+                    option = {"selectin": selectinload,
+                              "joined": joinedload}[strategy](prop)
+                else:
+                    option = getattr(option, strategy + "load")(prop)
+                target = prop.property.mapper.class_
+            options.append(option)
+        return options
+
     def new(self, obj):
         """Add the object to the current database session"""
         if obj is not None:
+            self.__cache.invalidate(f"{obj.__class__.__name__}.{obj.id}")
+            self.__results.bump(obj.__class__.__name__)
             self.__session.add(obj)
+            if self.__events.active:
+                self.__events.emit(Event("new", obj.__class__.__name__,
+                                         obj.id, obj))
+
+    def bulk_new(self, objs):
+        """Queue new objects for the next bulk_save()"""
+        for obj in objs:
+            if inspect(obj).transient:
+                self.__bulk.append(obj)
+            else:
+                self.__session.add(obj)
+            if self.__events.active:
+                self.__events.emit(Event("new", obj.__class__.__name__,
+                                         obj.id, obj))
 
     def save(self):
         """Commit all changes"""
         self.__session.commit()
+        self.__emit_saved()
+
+    def __emit_saved(self, objs=()):
+        """Send the save events of the objects flushed and objs"""
+        saved, self.__saved = self.__saved, []
+        if not self.__events.active:
+            return
+        for obj in objs:
+            row = {key: getattr(obj, key)
+                   for key in inspect(type(obj)).columns.keys()}
+            saved.append(Event("save", obj.__class__.__name__, obj.id, obj,
+                               row, {}))
+        for saved_event in saved:
+            self.__events.emit(saved_event)
+
+    def bulk_save(self, chunk_size=1000):
+        """Insert the queued objects in chunked executemany calls, commit
+
+        The rows skip the ORM unit of work, so only column attributes are
+        written; relationship collections set on the objects are not.
+        """
+        pending, self.__bulk = self.__bulk, []
+        tables = {}
+        for obj in pending:
+            mapper = inspect(type(obj))
+            row = {column.key: getattr(obj, key)
+                   for key, column in mapper.columns.items()
+                   if getattr(obj, key) is not None}
+            rows = tables.setdefault(mapper.local_table, {})
+            rows.setdefault(tuple(row), []).append(row)
+        try:
+            self.__session.flush()
+            for table in Base.metadata.sorted_tables:
+                for rows in tables.get(table, {}).values():
+                    for start in range(0, len(rows), chunk_size):
+                        self.__session.execute(
+                            table.insert(), rows[start:start + chunk_size])
+            self.__session.commit()
+        except Exception:
+            self.__session.rollback()
+            self.__bulk[:0] = pending
+            raise
+        for obj in pending:
+            make_transient_to_detached(obj)
+            self.__session.add(obj)
+        for name in {obj.__class__.__name__ for obj in pending}:
+            self.__results.bump(name)
+        self.__emit_saved(pending)
 
     def delete(self, obj=None):
         """Delete obj from session"""
         if obj is not None:
+            self.__cache.invalidate(f"{obj.__class__.__name__}.{obj.id}")
+            self.__results.bump(obj.__class__.__name__)
             self.__session.delete(obj)
+            if self.__events.active:
+                self.__events.emit(Event("delete", obj.__class__.__name__,
+                                         obj.id, obj))
+
+    def __flushed(self, session, flush_context):
+        """Forget the cached copies of the objects a flush wrote"""
+        for obj in chain(session.new, session.dirty, session.deleted):
+            self.__cache.invalidate(f"{obj.__class__.__name__}.{obj.id}")
+            self.__results.bump(obj.__class__.__name__)
+        if self.__events.active and session is self.__session:
+            for obj in chain(session.new, session.dirty):
+                state = inspect(obj)
+                new, old = {}, {}
+                for key in state.mapper.column_attrs.keys():
+                    history = state.attrs[key].history
+                    if history.added:
+                        new[key] = history.added[0]
+                    if history.deleted:
+                        old[key] = history.deleted[0]
+                self.__saved.append(Event("save", obj.__class__.__name__,
+                                          obj.id, obj, new, old))
+
+    def __rolled_back(self, session, previous_transaction):
+        """Forget every cached object, as a rollback may have reverted any"""
+        self.__cache.clear()
+        if session is self.__session:
+            self.__saved = []
+        for name in classes:
+            self.__results.bump(name)
 
     def reload(self):
         """Create tables and start a new session"""
         Base.metadata.create_all(self.__engine)
         session_factory = sessionmaker(
             bind=self.__engine,
+            class_=RoutingSession,
+            replicas=cycle(self.__replicas) if self.__replicas else None,
             expire_on_commit=False
         )
+        self.__factory = session_factory
+        event.listen(session_factory, "after_flush", self.__flushed)
+        event.listen(session_factory, "after_soft_rollback",
+                     self.__rolled_back)
         Session = scoped_session(session_factory)
         self.__session = Session()   # ✅ critical fix
+        if self.__events.active:
+            self.__events.emit(Event("reload"))
+
+    def pool_stats(self):
+        """Return the connection pool counters, see TimedQueuePool"""
+        stats = self.__engine.pool.stats()
+        if self.__replicas:
+            stats["replicas"] = [replica.pool.stats()
+                                 for replica in self.__replicas]
+        return stats
+
+    def index_report(self):
+        """Compare the declared indexes with the database, see index_report"""
+        from models.engine.indexes import index_report
+        return index_report(self.__engine, Base.metadata)
 
     def close(self):
         """Close the session"""
         self.__session.close()
+        self.__saved = []
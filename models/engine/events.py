@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+"""
+Contains the change events sent by the storage engines
+"""
+
+import queue
+import threading
+import traceback
+from collections import namedtuple
+
+
+class Event(namedtuple("Event", "kind cls id obj changes old",
+                       defaults=(None, None, None, None, None))):
+    """a change to the stored objects
+
+    kind is "new", "save", "delete" or "reload", and cls and id name the
+    object, which is obj. For "save", changes maps the attributes written
+    to their new values and old maps some of them to their previous values,
+    when the engine knew them cheaply; either may be empty. "reload" has
+    no object and cls is the reloaded class name, or None for all.
+    """
+    __slots__ = ()
+
+
+class EventBus:
+    """sends the change events of a storage engine to their handlers
+
+    Handlers run in the thread that made the change, or, when subscribed
+    with asynchronous=True, one at a time in a background thread. Engines
+    check active before building any event, so an unused bus costs a
+    single attribute lookup per change.
+    """
+
+    kinds = ("new", "save", "delete", "reload")
+
+    def __init__(self):
+        """Instantiate an EventBus without handlers"""
+        self.active = False
+        self.__handlers = {kind: () for kind in self.kinds}
+        self.__lock = threading.Lock()
+        self.__queue = None
+
+    def subscribe(self, kind, handler, asynchronous=False):
+        """calls handler(event) for every event of that kind"""
+        if kind not in self.__handlers:
+            raise ValueError("unknown event kind {!r}".format(kind))
+        with self.__lock:
+            if asynchronous and self.__queue is None:
+                self.__queue = queue.Queue()
+                threading.Thread(target=self.__dispatch, daemon=True,
+                                 name="EventBus-dispatcher").start()
+            self.__handlers[kind] += ((handler, asynchronous),)
+            self.active = True
+        return handler
+
+    def unsubscribe(self, kind, handler):
+        """stops calling handler for events of that kind"""
+        with self.__lock:
+            self.__handlers[kind] = tuple(
+                pair for pair in self.__handlers[kind] if pair[0] != handler)
+            self.active = any(self.__handlers.values())
+
+    def on_new(self, handler, asynchronous=False):
+        """subscribes handler to the objects given to new()"""
+        return self.subscribe("new", handler, asynchronous)
+
+    def on_save(self, handler, asynchronous=False):
+        """subscribes handler to the objects written by save()"""
+        return self.subscribe("save", handler, asynchronous)
+
+    def on_delete(self, handler, asynchronous=False):
+        """subscribes handler to the objects given to delete()"""
+        return self.subscribe("delete", handler, asynchronous)
+
+    def on_reload(self, handler, asynchronous=False):
+        """subscribes handler to the calls to reload()"""
+        return self.subscribe("reload", handler, asynchronous)
+
+    def emit(self, event):
+        """sends event to the handlers of its kind"""
+        for handler, asynchronous in self.__handlers[event.kind]:
+            if asynchronous:
+                self.__queue.put((handler, event))
+                continue
+            try:
+                handler(event)
+            except Exception:
+                traceback.print_exc()
+
+    def join(self):
+        """waits until the asynchronous handlers got every event sent"""
+        if self.__queue is not None:
+            self.__queue.join()
+
+    def __dispatch(self):
+        """background loop calling the asynchronous handlers"""
+        while True:
+            handler, event = self.__queue.get()
+            try:
+                handler(event)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self.__queue.task_done()
@@ -3,7 +3,21 @@
 Contains the FileStorage class
 """
 
+import atexit
+import heapq
 import json
+import os
+import re
+import tempfile
+import threading
+import time
+import traceback
+from itertools import chain, islice
+from os import getenv, path
+from zlib import crc32
+from models.engine.cache import ResultCache, parse_limits, query_key
+from models.engine.events import Event, EventBus
+from models.engine.locks import FileLock, NoLock, RWLock
 from models.amenity import Amenity
 from models.base_model import BaseModel
 from models.city import City
@@ -15,54 +29,1017 @@ from models.user import User
 classes = {"Amenity": Amenity, "BaseModel": BaseModel, "City": City,
            "Place": Place, "Review": Review, "State": State, "User": User}
 
+references = {"City": ("state_id",), "Place": ("city_id", "user_id"),
+              "Review": ("place_id", "user_id")}
+
+
+def _flag(name):
+    """returns True if the environment variable name is switched on"""
+    return getenv(name, "").lower() in ("1", "true", "yes", "on")
+
+
+class _Scanner:
+    """decodes JSON values one at a time from a file object"""
+
+    blank = re.compile(r"[ \t\r\n]*")
+    keyed = re.compile(r'[ \t\r\n]*\{[ \t\r\n]*(\}|"(?:[^"\\]|\\.)*"'
+                       r'[ \t\r\n]*:[ \t\r\n]*\{)')
+
+    def __init__(self, f, size=1 << 16):
+        """reads f in chunks of at least size characters"""
+        self.f = f
+        self.size = size
+        self.buf = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+        self.fill()
+
+    def fill(self):
+        """appends the next chunk to the buffer, False at end of file"""
+        chunk = self.f.read(max(self.size, len(self.buf) - self.pos))
+        if not chunk:
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """returns the next non-blank character, or '' at end of file"""
+        while True:
+            self.pos = self.blank.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self.fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def take(self):
+        """consumes and returns the next non-blank character"""
+        char = self.peek()
+        self.pos += 1
+        return char
+
+    def value(self):
+        """decodes the next JSON value, reading more of the file if cut"""
+        self.peek()
+        while True:
+            try:
+                value, self.pos = self.decoder.raw_decode(self.buf, self.pos)
+                return value
+            except ValueError:
+                if not self.fill():
+                    raise
+
+    def records(self):
+        """yields (key, record) pairs for every object in the store
+
+        Both layouts are understood: one {"<class>.<id>": {...}} object as
+        written in the json format, or one record per line for jsonl.
+        """
+        while not self.keyed.match(self.buf, self.pos) and \
+                len(self.buf) < 1 << 12 and self.fill():
+            pass
+        if self.keyed.match(self.buf, self.pos):
+            self.take()
+            while self.peek() not in ("}", ""):
+                key = self.value()
+                if self.take() != ":":
+                    raise ValueError("expected ':' after " + key)
+                yield key, self.value()
+                if self.take() != ",":
+                    break
+        else:
+            while self.peek():
+                record = self.value()
+                yield record["__class__"] + "." + record["id"], record
+
 
 class FileStorage:
-    """serializes instances to a JSON file & deserializes back to instances"""
+    """serializes instances to a JSON file & deserializes back to instances
+
+    With HBNB_FILE_JOURNAL enabled, save() appends one compact record per
+    changed object to a log next to the JSON file instead of rewriting
+    it, and the log is folded back into the JSON file once it grows past
+    HBNB_FILE_JOURNAL_MAX bytes. With HBNB_FILE_LAZY enabled, reload()
+    keeps the raw records and an object is only built the first time it
+    is fetched through all(), related() or a relationship property.
+
+    Objects written through new(), save() or an attribute assignment are
+    tracked as dirty; every other object is written back from the JSON
+    text cached when it was last serialized.
+
+    With HBNB_FILE_LAYOUT=sharded the store is a directory holding one
+    file per class, or HBNB_FILE_SHARDS files per class split on a hash
+    of the key, and save() only rewrites the files holding a dirty key.
+    reload(cls) and HBNB_FILE_CLASSES load a subset of the classes; the
+    others are read from disk the first time they are needed.
+
+    Files are replaced atomically: they are written to a temporary file,
+    fsynced (unless HBNB_FILE_FSYNC=0) and renamed over the old one. With
+    HBNB_FILE_GROUP_COMMIT_MS set, concurrent save() calls arriving within
+    that window are coalesced into a single durable write.
+
+    With HBNB_FILE_WRITE_BEHIND enabled, save() returns immediately and a
+    background thread flushes the dirty objects every
+    HBNB_FILE_FLUSH_INTERVAL seconds, as soon as HBNB_FILE_FLUSH_THRESHOLD
+    objects are dirty, on an explicit flush() and at interpreter exit. The
+    dirty objects are shared, so all the instances share one thread, which
+    flushes through the last write-behind instance created.
+
+    With HBNB_FILE_THREADSAFE enabled, every method holds a readers-writer
+    lock, all() returns a snapshot instead of the live dictionary and
+    disk writes happen outside the lock, so threaded web workers can
+    share the store.
+
+    close() only rereads what changed on disk since this process last
+    read or wrote it: a grown change log is replayed from where it was
+    left and only modified files (or shards) are parsed again. With
+    HBNB_FILE_SHARED enabled, saves and reloads also hold an fcntl lock
+    on a file next to the store, and save() first picks up the changes
+    saved by other processes so that it never overwrites them.
+    """
 
     __file_path = "file.json"
     __objects = {}
+    __dirty = {}
+    __serialized = {}
+    __parts = {}
+    __parted = None
+    __refs = {}
+    __raw = {}
+    __loaded = None
+    __reshard = False
+    __commits = threading.Condition()
+    __requested = 0
+    __committed = 0
+    __leading = False
+    __rwlock = RWLock()
+    __writer = threading.RLock()
+    __seen = {}
+    __versions = {}
+    __events = EventBus()
+    __changes = {}
+    __flusher = None
+    __flushing = None
+    __flusher_lock = threading.Lock()
+    __wake = threading.Event()
+
+    def __init__(self):
+        """Instantiate a FileStorage object"""
+        self.__format = getenv("HBNB_FILE_FORMAT", "json")
+        self.__journal = _flag("HBNB_FILE_JOURNAL")
+        self.__journal_max = int(getenv("HBNB_FILE_JOURNAL_MAX", 1 << 22))
+        self.__lazy = _flag("HBNB_FILE_LAZY")
+        self.__layout = getenv("HBNB_FILE_LAYOUT", "single")
+        self.__shards = int(getenv("HBNB_FILE_SHARDS", 1))
+        preload = getenv("HBNB_FILE_CLASSES")
+        self.__preload = set(preload.split(",")) if preload else None
+        self.__fsync = getenv("HBNB_FILE_FSYNC", "1") != "0"
+        self.__group_window = int(getenv("HBNB_FILE_GROUP_COMMIT_MS", 0))
+        self.__threadsafe = _flag("HBNB_FILE_THREADSAFE")
+        self.__guard = self.__rwlock if self.__threadsafe else NoLock()
+        self.__shared = _flag("HBNB_FILE_SHARED")
+        self.__results = ResultCache(
+            parse_limits(getenv("HBNB_RESULT_CACHE", "")), self.__versions)
+        if self.__shared:
+            self.__disk = FileLock(self.__file_path + ".lock")
+        else:
+            self.__disk = NoLock()
+        self.__write_behind = _flag("HBNB_FILE_WRITE_BEHIND")
+        self.__flush_interval = float(getenv("HBNB_FILE_FLUSH_INTERVAL", 1))
+        self.__flush_threshold = int(getenv("HBNB_FILE_FLUSH_THRESHOLD",
+                                            1000))
+        if self.__write_behind:
+            self.__start_flusher()
+
+    @property
+    def events(self):
+        """the EventBus told about the changes made through any instance"""
+        return self.__events
+
+    @property
+    def journal_path(self):
+        """path of the change log kept next to the JSON file"""
+        return self.__file_path + ".log"
+
+    @property
+    def shard_dir(self):
+        """directory holding the shard files of the sharded layout"""
+        return self.__file_path + ".d"
 
     def all(self, cls=None):
         """returns the dictionary __objects"""
+        name = None
+        if cls is not None:
+            name = cls if type(cls) is str else cls.__name__
+        with self.__guard.reading():
+            if self.__ready(name):
+                return self.__view(name)
+        with self.__guard.writing():
+            self.__ensure(None if name is None else (name,))
+            for each in list(self.__raw) if name is None else (name,):
+                self.__hydrate(each)
+            return self.__view(name)
+
+    def get(self, cls, id):
+        """returns the cls instance with the given id, or None"""
+        name = cls if type(cls) is str else cls.__name__
+        key = "{}.{}".format(name, id)
+        with self.__guard.reading():
+            if self.__ready(name):
+                return self.__objects.get(key)
+        with self.__guard.writing():
+            self.__ensure((name,))
+            self.__hydrate(name, (key,))
+            return self.__objects.get(key)
+
+    def count(self, cls=None):
+        """returns the number of stored objects, or of cls instances"""
+        name = None
         if cls is not None:
-            new_dict = {}
-            for key, value in self.__objects.items():
-                if cls == value.__class__ or cls == value.__class__.__name__:
-                    new_dict[key] = value
-            return new_dict
-        return self.__objects
+            name = cls if type(cls) is str else cls.__name__
+        with self.__guard.writing():
+            self.__ensure(None if name is None else (name,))
+            if name is None:
+                return len(self.__objects) + sum(map(len,
+                                                     self.__raw.values()))
+            return len(self.__partition().get(name, ())) + \
+                len(self.__raw.get(name, ()))
+
+    def iter(self, cls=None, batch_size=1000):
+        """yields the stored objects, or those of cls, one at a time
+
+        Only the keys are listed up front; the objects are looked up (and
+        built from lazily loaded records) batch_size at a time, so objects
+        deleted meanwhile are skipped and those added are not yielded.
+        """
+        name = None
+        if cls is not None:
+            name = cls if type(cls) is str else cls.__name__
+        with self.__guard.writing():
+            self.__ensure(None if name is None else (name,))
+            parts = self.__partition()
+            if name is None:
+                keys = list(chain(self.__objects,
+                                  chain.from_iterable(self.__raw.values())))
+            else:
+                keys = list(chain(parts.get(name, ()),
+                                  self.__raw.get(name, ())))
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+            with self.__guard.writing():
+                for key in batch:
+                    self.__hydrate(key.partition(".")[0], (key,))
+                objs = [self.__objects.get(key) for key in batch]
+            yield from (obj for obj in objs if obj is not None)
+
+    def __ready(self, name=None):
+        """tells whether class name (or every class) is loaded and built"""
+        if self.__loaded is not None:
+            return False
+        return not (self.__raw if name is None else self.__raw.get(name))
+
+    def __view(self, name=None):
+        """returns the objects of class name, or all of them"""
+        if name is not None:
+            return dict(self.__partition().get(name, {}))
+        return dict(self.__objects) if self.__threadsafe else self.__objects
 
     def new(self, obj):
         """sets in __objects the obj with key <obj class name>.id"""
         if obj is not None:
-            key = obj.__class__.__name__ + "." + obj.id
-            self.__objects[key] = obj
+            with self.__guard.writing():
+                self.__new(obj)
+            if self.__events.active:
+                self.__events.emit(Event("new", obj.__class__.__name__,
+                                         obj.id, obj))
+
+    def bulk_new(self, objs):
+        """new() for every object in objs, taking the lock only once"""
+        objs = list(objs)
+        with self.__guard.writing():
+            for obj in objs:
+                self.__new(obj)
+        if self.__events.active:
+            for obj in objs:
+                self.__events.emit(Event("new", obj.__class__.__name__,
+                                         obj.id, obj))
+
+    def __new(self, obj):
+        """new() with the lock held"""
+        key = obj.__class__.__name__ + "." + obj.id
+        self.__put(key, obj)
+        self.__dirty[key] = obj
+        self.__serialized.pop(key, None)
+
+    def related(self, cls, attr, value):
+        """returns the cls instances whose attribute attr equals value"""
+        name = cls if type(cls) is str else cls.__name__
+        with self.__guard.reading():
+            if self.__ready(name):
+                return self.__related(name, attr, value)
+        with self.__guard.writing():
+            self.__ensure((name,))
+            return self.__related(name, attr, value)
+
+    def __related(self, name, attr, value):
+        """related() once class name is loaded"""
+        index = self.__refs.get((name, attr))
+        if index is None:
+            self.__hydrate(name)
+            return [obj for obj in self.__partition().get(name, {}).values()
+                    if getattr(obj, attr, None) == value]
+        keys = list(index.get(value, ()))
+        self.__hydrate(name, keys)
+        part = self.__partition().get(name, {})
+        return [part[key] for key in keys]
+
+    def query(self, cls, where=None, order_by=None, limit=None, offset=0,
+              load=None):
+        """returns the cls instances matching where, sorted and paged
+
+        where maps attribute names to the values they must equal, and
+        order_by names one attribute, or a list of them, each prefixed
+        with "-" to sort in descending order. load names relationship
+        paths to prefetch() on the result.
+        """
+        name = cls if type(cls) is str else cls.__name__
+        args = query_key(where, order_by, limit, offset)
+        with self.__guard.reading():
+            self.__partition()
+            objs = None if args is None else self.__results.get(name, args)
+        if objs is not None:
+            objs = list(objs)
+        else:
+            objs = self.__cached_query(name, args, dict(where or {}),
+                                       order_by, limit, offset)
+        if type(load) is str:
+            load = [load]
+        return self.prefetch(objs, *(load or ()))
+
+    def __cached_query(self, name, args, where, order_by, limit, offset):
+        """runs query() and caches its result under args"""
+        with self.__guard.reading():
+            ready = self.__ready(name)
+            if ready:
+                version = self.__results.version(name)
+                objs = self.__query(name, where, order_by, limit, offset)
+        if not ready:
+            with self.__guard.writing():
+                self.__ensure((name,))
+                version = self.__results.version(name)
+                objs = self.__query(name, where, order_by, limit, offset)
+        if args is not None:
+            self.__results.put(name, args, tuple(objs), version)
+        return objs
+
+    def cache_stats(self):
+        """returns the hit and miss counters of the query() cache"""
+        return {"results": self.__results.stats()}
+
+    def prefetch(self, objs, *paths, strategy=None):
+        """builds the objects along the relationship paths of objs
+
+        Relationships are answered from the reverse indexes, so this only
+        matters in lazy mode, where it builds the related objects up front.
+        strategy is accepted for compatibility with DBStorage.
+        """
+        objs = list(objs)
+        for path in paths:
+            level = objs
+            for attr in path.split("."):
+                children = []
+                for obj in level:
+                    value = getattr(obj, attr, None)
+                    if type(value) is list:
+                        children.extend(value)
+                    elif value is not None:
+                        children.append(value)
+                level = children
+        return objs
+
+    def __query(self, name, where, order_by, limit, offset):
+        """query() once class name is loaded"""
+        attr = next((attr for attr in where if (name, attr) in self.__refs),
+                    None)
+        if attr is not None:
+            objs = self.__related(name, attr, where.pop(attr))
+        else:
+            self.__hydrate(name)
+            objs = self.__partition().get(name, {}).values()
+        if where:
+            objs = (obj for obj in objs
+                    if all(getattr(obj, attr, None) == value
+                           for attr, value in where.items()))
+        return self.__page(objs, order_by, limit, offset)
+
+    @staticmethod
+    def __page(objs, order_by, limit, offset):
+        """sorts objs by order_by and slices out the requested page"""
+        if type(order_by) is str:
+            order_by = [order_by]
+        end = None if limit is None else offset + limit
+        order_by = list(order_by or ())
+        for attr in order_by[::-1]:
+            reverse = attr.startswith("-")
+            attr = attr.lstrip("-")
+
+            def key(obj, attr=attr):
+                value = getattr(obj, attr, None)
+                return (value is not None, value)
+
+            if end is not None and len(order_by) == 1:
+                pick = heapq.nlargest if reverse else heapq.nsmallest
+                objs = pick(end, objs, key=key)
+            else:
+                objs = sorted(objs, key=key, reverse=reverse)
+        return list(islice(objs, offset, end))
+
+    def changed(self, obj, attr, old):
+        """marks obj dirty after its attribute attr changed from old"""
+        name = obj.__class__.__name__
+        key = "{}.{}".format(name, obj.__dict__.get("id"))
+        if self.__objects.get(key) is not obj:
+            return
+        with self.__guard.writing():
+            self.__changed(obj, name, key, attr, old)
+
+    def __changed(self, obj, name, key, attr, old):
+        """changed() with the lock held"""
+        if self.__objects.get(key) is not obj:
+            return
+        self.__dirty[key] = obj
+        self.__serialized.pop(key, None)
+        self.__results.bump(name)
+        if self.__events.active:
+            changes, olds = self.__changes.setdefault(key, ({}, {}))
+            changes[attr] = getattr(obj, attr, None)
+            if attr.endswith("_id"):
+                olds.setdefault(attr, old)
+        index = self.__refs.get((name, attr))
+        if index is None or self.__partition().get(name, {}).get(key) \
+                is not obj:
+            return
+        bucket = index.get(old)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del index[old]
+        index.setdefault(getattr(obj, attr, None), {})[key] = None
+
+    def __partition(self):
+        """returns __objects split per class name, rebuilding it if stale"""
+        objects = self.__objects
+        parts = FileStorage.__parts
+        if FileStorage.__parted is not objects or \
+                sum(map(len, parts.values())) != len(objects):
+            if FileStorage.__parted is not objects:
+                FileStorage.__loaded = None
+                FileStorage.__raw = {}
+                FileStorage.__dirty = {}
+                FileStorage.__changes = {}
+                FileStorage.__serialized = {}
+            for name in classes:
+                self.__results.bump(name)
+            parts = {}
+            FileStorage.__refs = {}
+            for key, obj in objects.items():
+                parts.setdefault(obj.__class__.__name__, {})[key] = obj
+                self.__index(key, obj)
+            for records in self.__raw.values():
+                for key, record in records.items():
+                    self.__index(key, record)
+            FileStorage.__parts = parts
+            FileStorage.__parted = objects
+        return parts
+
+    def __hydrate(self, name, keys=None):
+        """builds the objects for the raw records of class name"""
+        records = self.__raw.get(name)
+        if not records:
+            return
+        for key in list(records) if keys is None else keys:
+            record = records.get(key)
+            if record is not None:
+                self.__put(key, classes[name](**record))
+
+    def __index(self, key, obj, add=True):
+        """adds key to (or removes it from) the reverse indexes of obj"""
+        raw = type(obj) is dict
+        name = obj["__class__"] if raw else obj.__class__.__name__
+        for attr in references.get(name, ()):
+            index = self.__refs.setdefault((name, attr), {})
+            if raw:
+                value = obj.get(attr, getattr(classes[name], attr, None))
+            else:
+                value = getattr(obj, attr, None)
+            if add:
+                index.setdefault(value, {})[key] = None
+            elif value in index:
+                index[value].pop(key, None)
+                if not index[value]:
+                    del index[value]
+
+    def __put(self, key, obj):
+        """stores obj under key in __objects and its class partition"""
+        parts = self.__partition()
+        record = self.__raw.get(obj.__class__.__name__, {}).pop(key, None)
+        if record is not None:
+            self.__index(key, record, add=False)
+        old = self.__objects.get(key)
+        if old is not None:
+            parts[old.__class__.__name__].pop(key, None)
+            self.__index(key, old, add=False)
+        self.__objects[key] = obj
+        parts.setdefault(obj.__class__.__name__, {})[key] = obj
+        self.__index(key, obj)
+        self.__results.bump(obj.__class__.__name__)
+
+    def __drop(self, key):
+        """removes key from __objects and its class partition"""
+        parts = self.__partition()
+        obj = self.__objects.pop(key, None)
+        self.__results.bump(key.partition(".")[0])
+        if obj is not None:
+            parts[obj.__class__.__name__].pop(key, None)
+            self.__index(key, obj, add=False)
+        self.__serialized.pop(key, None)
+        record = self.__raw.get(key.partition(".")[0], {}).pop(key, None)
+        if record is not None:
+            self.__index(key, record, add=False)
+            return obj or record
+        return obj
+
+    def __load(self, key, record):
+        """stores a record read from disk, as an object unless lazy"""
+        if not self.__lazy:
+            self.__put(key, classes[record["__class__"]](**record))
+            self.__serialized.pop(key, None)
+            return
+        self.__drop(key)
+        self.__raw.setdefault(record["__class__"], {})[key] = record
+        self.__index(key, record)
+        self.__results.bump(record["__class__"])
+
+    def __ensure(self, names=None, skip=None):
+        """reads from disk the classes in names that were not loaded yet"""
+        self.__partition()
+        loaded = self.__loaded
+        if loaded is None:
+            return
+        missing = set(classes if names is None else names) - loaded
+        if missing:
+            self.__read(missing, skip=self.__dirty if skip is None else
+                        set(skip) | set(self.__dirty))
+            loaded |= missing
+        if loaded >= set(classes):
+            FileStorage.__loaded = None
 
     def save(self):
         """serializes __objects to the JSON file (path: __file_path)"""
-        json_objects = {}
-        for key in self.__objects:
-            json_objects[key] = self.__objects[key].to_dict()
-        with open(self.__file_path, 'w') as f:
-            json.dump(json_objects, f)
-
-    def reload(self):
-        """deserializes the JSON file to __objects"""
+        if not self.__write_behind:
+            self.flush()
+        elif len(self.__dirty) >= self.__flush_threshold:
+            self.__wake.set()
+
+    def bulk_save(self):
+        """writes the objects added by bulk_new() in a single save()"""
+        self.save()
+
+    def flush(self):
+        """writes the pending changes to disk before returning"""
+        if self.__group_window <= 0:
+            self.__commit()
+            return
+        commits = self.__commits
+        with commits:
+            FileStorage.__requested += 1
+            ticket = self.__requested
+            while self.__leading and self.__committed < ticket:
+                commits.wait()
+            if self.__committed >= ticket:
+                return
+            FileStorage.__leading = True
+        committed = self.__committed
         try:
-            with open(self.__file_path, 'r') as f:
-                jo = json.load(f)
-            for key in jo:
-                self.__objects[key] = classes[jo[key]["__class__"]](**jo[key])
-        except:
-            pass
+            time.sleep(self.__group_window / 1000)
+            with commits:
+                batch = self.__requested
+            self.__commit()
+            committed = batch
+        finally:
+            with commits:
+                FileStorage.__committed = max(self.__committed, committed)
+                FileStorage.__leading = False
+                commits.notify_all()
+
+    def __start_flusher(self):
+        """flushes through self, starting the write-behind thread if needed"""
+        with self.__flusher_lock:
+            FileStorage.__flushing = self
+            if self.__flusher is None:
+                stopped = threading.Event()
+                thread = threading.Thread(target=self.__flush_loop,
+                                          args=(stopped,),
+                                          name="FileStorage-flusher",
+                                          daemon=True)
+                FileStorage.__flusher = (thread, stopped)
+                thread.start()
+                atexit.register(self.__shutdown)
+
+    @classmethod
+    def __flush_loop(cls, stopped):
+        """background loop of the write-behind mode"""
+        while not stopped.is_set():
+            cls.__wake.wait(cls.__flushing.__flush_interval)
+            cls.__wake.clear()
+            if cls.__dirty and not stopped.is_set():
+                try:
+                    cls.__flushing.flush()
+                except Exception:
+                    traceback.print_exc()
+
+    @classmethod
+    def __shutdown(cls):
+        """stops the write-behind thread and flushes what is left"""
+        with cls.__flusher_lock:
+            if cls.__flusher is None:
+                return
+            (thread, stopped), FileStorage.__flusher = cls.__flusher, None
+            atexit.unregister(cls.__shutdown)
+        stopped.set()
+        cls.__wake.set()
+        thread.join()
+        if cls.__dirty:
+            cls.__flushing.flush()
+
+    def __commit(self):
+        """writes the dirty objects out in the configured mode"""
+        with self.__writer, self.__disk.exclusive():
+            with self.__guard.writing():
+                dirty, changes = self.__dirty, self.__changes
+                FileStorage.__dirty, FileStorage.__changes = {}, {}
+                try:
+                    if self.__shared:
+                        self.__refresh(dirty)
+                    if self.__journal:
+                        plan = self.__records(dirty)
+                    elif self.__layout == "sharded" and not self.__reshard:
+                        self.__ensure({key.partition(".")[0]
+                                       for key in dirty}, dirty)
+                        plan = self.__dump(dirty)
+                    else:
+                        self.__ensure(skip=dirty)
+                        plan = self.__dump()
+                except BaseException:
+                    self.__restore(dirty, changes)
+                    raise
+            try:
+                if self.__journal:
+                    self.__append(plan)
+                else:
+                    self.__store(*plan)
+            except BaseException:
+                with self.__guard.writing():
+                    self.__restore(dirty, changes)
+                raise
+        if self.__events.active:
+            for key, obj in dirty.items():
+                if obj is not None:
+                    new, old = changes.get(key, ({}, {}))
+                    self.__events.emit(Event("save", obj.__class__.__name__,
+                                             obj.id, obj, new, old))
+
+    def __restore(self, dirty, changes):
+        """marks the objects of a failed write dirty again"""
+        dirty.update(self.__dirty)
+        FileStorage.__dirty = dirty
+        for key, (new, old) in self.__changes.items():
+            ours = changes.setdefault(key, ({}, {}))
+            ours[0].update(new)
+            for attr, value in old.items():
+                ours[1].setdefault(attr, value)
+        FileStorage.__changes = changes
+
+    def __records(self, dirty):
+        """returns the change log lines recording the dirty objects"""
+        lines = []
+        for key, obj in dirty.items():
+            if obj is None:
+                lines.append('{"k":' + json.dumps(key) + '}\n')
+            else:
+                lines.append('{"k":' + json.dumps(key) + ',"v":' +
+                             self.__serialize(key, obj) + '}\n')
+        return "".join(lines)
+
+    def __append(self, lines):
+        """appends lines to the change log, compacting it when too big"""
+        if not lines:
+            return
+        with open(self.journal_path, 'a+b') as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size:
+                f.seek(stat.st_size - 1)
+                if f.read(1) != b"\n":
+                    lines = "\n" + lines
+            f.write(lines.encode())
+            f.flush()
+            if self.__fsync:
+                os.fsync(f.fileno())
+            size = os.fstat(f.fileno()).st_size
+        if not stat.st_size or \
+                self.__seen.get(self.journal_path) == (stat.st_ino,
+                                                       stat.st_size):
+            self.__seen[self.journal_path] = (stat.st_ino, size)
+        if size > self.__journal_max:
+            self.compact()
+
+    def compact(self):
+        """folds the change log back into a fresh JSON snapshot"""
+        with self.__writer, self.__disk.exclusive():
+            with self.__guard.writing():
+                if self.__shared:
+                    self.__refresh()
+                self.__ensure()
+                plan = self.__dump()
+            self.__store(*plan)
+            if path.exists(self.journal_path):
+                with open(self.journal_path, 'w') as f:
+                    self.__seen[self.journal_path] = \
+                        (os.fstat(f.fileno()).st_ino, 0)
+
+    def __serialize(self, key, obj):
+        """returns the JSON text of obj, reusing it while obj is clean"""
+        text = self.__serialized.get(key)
+        if text is None:
+            text = json.dumps(obj if type(obj) is dict else obj.to_dict())
+            self.__serialized[key] = text
+        return text
+
+    def __shard(self, key):
+        """returns the name of the shard file that holds key"""
+        name = key.partition(".")[0]
+        if self.__shards == 1:
+            return name + ".json"
+        return "{}.{}.json".format(name, crc32(key.encode()) % self.__shards)
+
+    def __dump(self, dirty=None):
+        """serializes the store, or the shards holding a dirty key
+
+        Returns the (key, JSON text) pairs to write per file and the files
+        to remove, None meaning every other shard file.
+        """
+        parts = self.__partition()
+        if self.__layout != "sharded":
+            pairs = [self.__objects.items()]
+            pairs.extend(records.items() for records in self.__raw.values())
+            return {self.__file_path: [
+                (key, self.__serialize(key, obj))
+                for key, obj in chain.from_iterable(pairs)]}, set()
+        wanted = None if dirty is None else set(map(self.__shard, dirty))
+        names = set(parts) | set(self.__raw) if dirty is None else \
+            {key.partition(".")[0] for key in dirty}
+        shards = {}
+        for name in names:
+            for key, obj in chain(parts.get(name, {}).items(),
+                                  self.__raw.get(name, {}).items()):
+                shard = self.__shard(key)
+                if wanted is None or shard in wanted:
+                    shards.setdefault(path.join(self.shard_dir, shard),
+                                      []).append(
+                        (key, self.__serialize(key, obj)))
+        if wanted is None:
+            return shards, None
+        return shards, {path.join(self.shard_dir, shard)
+                        for shard in wanted} - set(shards)
+
+    def __store(self, writes, removes):
+        """writes the files serialized by __dump() and removes the stale"""
+        if self.__layout != "sharded":
+            for file_path, pairs in writes.items():
+                self.__write(file_path, pairs)
+            return
+        os.makedirs(self.shard_dir, exist_ok=True)
+        for file_path, pairs in writes.items():
+            self.__write(file_path, pairs, sync_dir=False)
+        if removes is None:
+            removes = {path.join(self.shard_dir, shard)
+                       for shard in os.listdir(self.shard_dir)
+                       if shard.endswith(".json")} - set(writes)
+            FileStorage.__reshard = False
+        for file_path in removes:
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            self.__seen[file_path] = None
+        self.__sync_dir(self.shard_dir)
+
+    def __write(self, file_path, pairs, sync_dir=True):
+        """atomically replaces file_path with the (key, JSON text) pairs"""
+        fd, tmp = tempfile.mkstemp(dir=path.dirname(file_path) or ".",
+                                   prefix=path.basename(file_path) + ".",
+                                   suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                if self.__format == "jsonl":
+                    for key, text in pairs:
+                        f.write(text + "\n")
+                else:
+                    sep = "{"
+                    for key, text in pairs:
+                        f.write(sep + json.dumps(key) + ": " + text)
+                        sep = ", "
+                    f.write("}" if sep == ", " else "{}")
+                f.flush()
+                if self.__fsync:
+                    os.fsync(f.fileno())
+                signature = self.__signature(f.fileno())
+            os.replace(tmp, file_path)
+            self.__seen[file_path] = signature
+        except BaseException:
+            os.remove(tmp)
+            raise
+        if sync_dir:
+            self.__sync_dir(path.dirname(file_path) or ".")
+
+    @staticmethod
+    def __signature(file):
+        """returns what tells a file path (or descriptor) has changed"""
+        try:
+            stat = os.stat(file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def __sync_dir(self, dir_path):
+        """makes renames inside dir_path durable where the OS allows it"""
+        if not self.__fsync or not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(dir_path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def reload(self, cls=None):
+        """deserializes the JSON file to __objects
+
+        cls limits the reload to one class or a list of classes; by default
+        every class, or those listed in HBNB_FILE_CLASSES, is loaded.
+        """
+        if cls is None:
+            names = self.__preload
+        else:
+            names = {c if type(c) is str else c.__name__ for c in
+                     (cls if type(cls) in (list, tuple, set) else [cls])}
+        with self.__disk.shared(), self.__guard.writing():
+            self.__read(names)
+            if names is None:
+                FileStorage.__loaded = None
+            else:
+                FileStorage.__loaded = (self.__loaded or set()) | names
+        if self.__events.active:
+            for name in [None] if names is None else sorted(names):
+                self.__events.emit(Event("reload", name))
+
+    def __read(self, names=None, skip=()):
+        """loads the records of the classes in names (all if None)"""
+        if self.__layout != "sharded":
+            self.__scan(self.__file_path, names, skip)
+        else:
+            try:
+                files = sorted(os.listdir(self.shard_dir))
+            except FileNotFoundError:
+                files = []
+            for shard in files:
+                name = shard.partition(".")[0]
+                if not shard.endswith(".json") or \
+                        names is not None and name not in names:
+                    continue
+                self.__scan(path.join(self.shard_dir, shard), names, skip)
+                suffix = shard[len(name) + 1:-len(".json")]
+                if self.__shards == 1 and suffix or self.__shards > 1 and \
+                        not (suffix.isdigit() and int(suffix) < self.__shards):
+                    FileStorage.__reshard = True
+        if self.__journal:
+            self.__replay(names, skip)
+
+    def __scan(self, file_path, names, skip, found=None):
+        """loads the records of a single JSON file"""
+        try:
+            f = open(file_path, 'r')
+        except FileNotFoundError:
+            self.__seen[file_path] = None
+            return
+        with f:
+            self.__seen[file_path] = self.__signature(f.fileno())
+            for key, value in _Scanner(f).records():
+                if found is not None:
+                    found.add(key)
+                if key in skip or \
+                        names is not None and value["__class__"] not in names:
+                    continue
+                self.__load(key, value)
+
+    def __replay(self, names=None, skip=(), start=0, found=None):
+        """applies the change log, from byte start, to the loaded objects"""
+        try:
+            f = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            self.__seen[self.journal_path] = None
+            return
+        with f:
+            inode = os.fstat(f.fileno()).st_ino
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                start += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                key = record["k"]
+                if found is not None and "v" in record:
+                    found.add(key)
+                elif found is not None:
+                    found.discard(key)
+                if key in skip or names is not None and \
+                        key.partition(".")[0] not in names:
+                    continue
+                if "v" in record:
+                    self.__load(key, record["v"])
+                else:
+                    self.__drop(key)
+        self.__seen[self.journal_path] = (inode, start)
+
+    def refresh(self):
+        """rereads only the files that changed since they were last read"""
+        with self.__disk.shared(), self.__guard.writing():
+            self.__refresh()
+
+    def __refresh(self, skip=()):
+        """refresh() with the locks held; keys in skip are left alone"""
+        self.__partition()
+        names = self.__loaded
+        skip = set(skip) | set(self.__dirty)
+        if self.__layout != "sharded":
+            files = [self.__file_path]
+        else:
+            try:
+                files = {path.join(self.shard_dir, shard)
+                         for shard in os.listdir(self.shard_dir)
+                         if shard.endswith(".json")}
+            except FileNotFoundError:
+                files = set()
+            files = sorted(files | {file_path for file_path in self.__seen
+                                    if path.dirname(file_path) ==
+                                    self.shard_dir})
+        changed = [file_path for file_path in files if
+                   self.__signature(file_path) != self.__seen.get(file_path)]
+        found = set()
+        for file_path in changed:
+            self.__scan(file_path, names, skip, found)
+        if self.__journal:
+            seen = self.__seen.get(self.journal_path)
+            stat = self.__signature(self.journal_path)
+            if changed or seen is None or stat is None or \
+                    stat[0] != seen[0] or stat[1] < seen[1]:
+                self.__replay(names, skip, found=found)
+            elif stat[1] > seen[1]:
+                self.__replay(names, skip, seen[1])
+        if changed:
+            self.__prune(changed, found, names, skip)
+
+    def __prune(self, files, found, names, skip):
+        """drops the objects that the reread files no longer hold"""
+        sharded = self.__layout == "sharded"
+        for file_path in files:
+            shard = path.basename(file_path)
+            name = shard.partition(".")[0] if sharded else None
+            if names is not None and name is not None and name not in names:
+                continue
+            pairs = [self.__objects]
+            pairs.extend(self.__raw.values())
+            keys = [key for key in chain.from_iterable(pairs)
+                    if key not in found and key not in skip and
+                    (not sharded or key.partition(".")[0] == name and
+                     self.__shard(key) == shard) and
+                    (names is None or key.partition(".")[0] in names)]
+            for key in keys:
+                self.__drop(key)
 
     def delete(self, obj=None):
         """delete obj from __objects if it's inside"""
         if obj is not None:
             key = obj.__class__.__name__ + '.' + obj.id
-            if key in self.__objects:
-                del self.__objects[key]
+            with self.__guard.writing():
+                dropped = self.__drop(key) is not None
+                if dropped:
+                    self.__dirty[key] = None
+                    self.__changes.pop(key, None)
+            if dropped and self.__events.active:
+                self.__events.emit(Event("delete", obj.__class__.__name__,
+                                         obj.id, obj))
 
     def close(self):
-        """call reload() method for deserializing the JSON file to objects"""
-        self.reload()
+        """picks up the changes saved to disk since the last read"""
+        self.refresh()
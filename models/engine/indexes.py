@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+"""
+Compares the indexes declared by the models with those of a live schema
+
+Run it as a command to print the report of the configured database:
+
+    HBNB_TYPE_STORAGE=db HBNB_MYSQL_USER=... python3 -m models.engine.indexes
+
+It exits with status 1 when an index or a foreign key index is missing.
+"""
+
+import sys
+from sqlalchemy import exc, inspect, text
+from sqlalchemy.schema import CreateIndex
+
+_UNUSED = text(
+    "SELECT object_name, index_name "
+    "FROM performance_schema.table_io_waits_summary_by_index_usage "
+    "WHERE object_schema = DATABASE() AND index_name IS NOT NULL "
+    "AND index_name != 'PRIMARY' AND count_star = 0")
+
+
+def index_report(engine, metadata):
+    """returns the differences between metadata and the schema of engine
+
+    The report maps each finding to a list of (table, index, columns):
+    "missing" indexes are declared but absent from the schema, which
+    create_all() does not fix for tables that already exist, "unindexed"
+    foreign keys are not the leftmost columns of any index, "undeclared"
+    indexes exist but are not declared, and "unused" indexes were never
+    read since the MySQL server started. "unused" is None on the other
+    databases, or when performance_schema cannot be read. "create" holds
+    the CREATE INDEX statements adding the missing indexes.
+    """
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    report = {"missing": [], "unindexed": [], "undeclared": [],
+              "unused": _unused(engine, inspector, metadata), "create": []}
+    for table in metadata.sorted_tables:
+        declared = {tuple(column.name for column in index.columns): index.name
+                    for index in table.indexes}
+        if table.name not in tables:
+            report["missing"] += [(table.name, name, columns)
+                                  for columns, name in declared.items()]
+            continue
+        live = {tuple(index["column_names"]): index["name"]
+                for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            columns = tuple(column.name for column in index.columns)
+            if columns not in live:
+                report["missing"].append((table.name, index.name, columns))
+                report["create"].append(str(CreateIndex(index).compile(
+                    dialect=engine.dialect)).strip())
+        report["undeclared"] += [(table.name, name, columns)
+                                 for columns, name in live.items()
+                                 if columns not in declared]
+        keys = list(live) + [tuple(inspector.get_pk_constraint(
+            table.name)["constrained_columns"])]
+        for fk in inspector.get_foreign_keys(table.name):
+            columns = tuple(fk["constrained_columns"])
+            if not any(key[:len(columns)] == columns for key in keys):
+                report["unindexed"].append((table.name, fk["name"], columns))
+    return report
+
+
+def _unused(engine, inspector, metadata):
+    """returns the indexes of metadata's tables MySQL never read, or None"""
+    if engine.dialect.name != "mysql":
+        return None
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(_UNUSED).fetchall()
+    except exc.DBAPIError:
+        return None
+    unused = []
+    for table, name in rows:
+        if table not in metadata.tables:
+            continue
+        for index in inspector.get_indexes(table):
+            if index["name"] == name:
+                unused.append((table, name, tuple(index["column_names"])))
+    return unused
+
+
+def main():
+    """prints the index report of models.storage"""
+    from models import storage
+    if not hasattr(storage, "index_report"):
+        sys.exit("the index report needs HBNB_TYPE_STORAGE=db or sqlite")
+    report = storage.index_report()
+    for finding in ("missing", "unindexed", "undeclared", "unused"):
+        for table, name, columns in report[finding] or ():
+            print("{:<10} {}.{} ({})".format(finding, table, name,
+                                             ", ".join(columns)))
+    if report["unused"] is None:
+        print("unused     not available on this database")
+    for statement in report["create"]:
+        print(statement + ";")
+    storage.close()
+    return 1 if report["missing"] or report["unindexed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+"""
+Contains the locks shared by the storage engines
+"""
+
+from contextlib import contextmanager, nullcontext
+import os
+import threading
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class RWLock:
+    """a readers-writer lock
+
+    Any number of threads may hold it for reading, or a single thread for
+    writing. Waiting writers are served before new readers, and the thread
+    holding the write lock may acquire it again, for reading or writing.
+    """
+
+    def __init__(self):
+        """Instantiate an unlocked RWLock"""
+        self.__cond = threading.Condition(threading.Lock())
+        self.__readers = 0
+        self.__writer = None
+        self.__depth = 0
+        self.__waiting = 0
+
+    def acquire_read(self):
+        """blocks until the lock can be shared with other readers"""
+        me = threading.get_ident()
+        with self.__cond:
+            if self.__writer == me:
+                self.__depth += 1
+                return
+            while self.__writer is not None or self.__waiting:
+                self.__cond.wait()
+            self.__readers += 1
+
+    def release_read(self):
+        """releases a lock taken with acquire_read()"""
+        with self.__cond:
+            if self.__writer == threading.get_ident():
+                self.__depth -= 1
+                return
+            self.__readers -= 1
+            if not self.__readers:
+                self.__cond.notify_all()
+
+    def acquire_write(self):
+        """blocks until the calling thread holds the lock alone"""
+        me = threading.get_ident()
+        with self.__cond:
+            if self.__writer == me:
+                self.__depth += 1
+                return
+            self.__waiting += 1
+            try:
+                while self.__writer is not None or self.__readers:
+                    self.__cond.wait()
+            finally:
+                self.__waiting -= 1
+            self.__writer = me
+            self.__depth = 1
+
+    def release_write(self):
+        """releases a lock taken with acquire_write()"""
+        with self.__cond:
+            self.__depth -= 1
+            if not self.__depth:
+                self.__writer = None
+                self.__cond.notify_all()
+
+    @contextmanager
+    def reading(self):
+        """holds the lock for reading inside a with block"""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def writing(self):
+        """holds the lock for writing inside a with block"""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class FileLock:
+    """an advisory lock shared by the processes opening the same file
+
+    It is built on fcntl.flock and does nothing where fcntl is missing.
+    The thread holding the lock may acquire it again, and asking for the
+    exclusive lock while holding the shared one upgrades it.
+    """
+
+    def __init__(self, path):
+        """Instantiate a FileLock on the file at path"""
+        self.path = path
+        self.__held = threading.local()
+
+    def shared(self):
+        """holds the lock alongside other readers inside a with block"""
+        return self.__hold(False)
+
+    def exclusive(self):
+        """holds the lock alone inside a with block"""
+        return self.__hold(True)
+
+    @contextmanager
+    def __hold(self, exclusive):
+        """takes the lock, or re-enters it when this thread holds it"""
+        held = self.__held
+        if fcntl is None:
+            yield
+            return
+        if getattr(held, "depth", 0):
+            if exclusive and not held.exclusive:
+                fcntl.flock(held.fd, fcntl.LOCK_EX)
+                held.exclusive = True
+            held.depth += 1
+            try:
+                yield
+            finally:
+                held.depth -= 1
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            held.fd, held.exclusive, held.depth = fd, exclusive, 1
+            yield
+        finally:
+            held.depth = 0
+            os.close(fd)
+
+
+class NoLock:
+    """stands in for RWLock or FileLock where no locking is wanted"""
+
+    def reading(self):
+        """returns a context manager that does nothing"""
+        return nullcontext()
+
+    writing = shared = exclusive = reading
@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+"""
+Contains the connection pool used by DBStorage
+"""
+
+import threading
+from time import perf_counter
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+
+class TimedQueuePool(QueuePool):
+    """a QueuePool that counts its checkouts and the time spent on them
+
+    stats() reports the checkouts, the time callers waited for a
+    connection, how often and how far the pool overflowed, the timeouts
+    and the invalidated connections. recreate() keeps the counters.
+    """
+
+    def __init__(self, creator, **kwargs):
+        """Instantiate a TimedQueuePool, see QueuePool for the arguments"""
+        recreated = "_dispatch" in kwargs
+        super().__init__(creator, **kwargs)
+        self.__lock = threading.Lock()
+        self.__counts = {"checkouts": 0, "wait_time": 0.0, "max_wait": 0.0,
+                         "overflow_checkouts": 0, "max_overflow_used": 0,
+                         "timeouts": 0, "invalidations": 0}
+        if not recreated:
+            event.listen(self, "invalidate", self.__invalidated)
+
+    def _do_get(self):
+        """checks a connection out, timing how long it took"""
+        start = perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            with self.__lock:
+                self.__counts["timeouts"] += 1
+            raise
+        wait = perf_counter() - start
+        overflow = self._overflow
+        with self.__lock:
+            counts = self.__counts
+            counts["checkouts"] += 1
+            counts["wait_time"] += wait
+            counts["max_wait"] = max(counts["max_wait"], wait)
+            if overflow > 0:
+                counts["overflow_checkouts"] += 1
+                counts["max_overflow_used"] = max(
+                    counts["max_overflow_used"], overflow)
+        return conn
+
+    def __invalidated(self, dbapi_connection, connection_record, exception):
+        """counts a connection invalidated by a disconnect or by hand"""
+        with self.__lock:
+            self.__counts["invalidations"] += 1
+
+    def recreate(self):
+        """returns a new pool with the same settings and counters"""
+        pool = super().recreate()
+        pool.__lock, pool.__counts = self.__lock, self.__counts
+        return pool
+
+    def stats(self):
+        """returns the counters and the current state of the pool"""
+        with self.__lock:
+            stats = dict(self.__counts)
+        stats.update(size=self.size(), checked_in=self.checkedin(),
+                     checked_out=self.checkedout(),
+                     overflow=max(self.overflow(), 0),
+                     max_overflow=self._max_overflow)
+        return stats
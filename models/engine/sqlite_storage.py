@@ -0,0 +1,51 @@
+#!/usr/bin/python3
+"""
+Contains the class SQLiteStorage
+"""
+from os import getenv
+from sqlalchemy import create_engine, event
+
+from models.engine.db_storage import DBStorage
+from models.engine.pool import TimedQueuePool
+
+pragmas = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "foreign_keys": "ON",
+    "busy_timeout": 5000,
+    "cache_size": -65536,
+    "temp_store": "MEMORY",
+    "mmap_size": 1 << 28
+}
+
+
+class SQLiteStorage(DBStorage):
+    """Interacts with a SQLite database file, with the DBStorage mappings
+
+    The file is HBNB_SQLITE_PATH. It runs in WAL mode, so readers never
+    wait for the writer, and commits only fsync at checkpoints.
+    """
+    __engine = None
+
+    def _create_engine(self, host):
+        """Create the engine of the database file, once for every host"""
+        if self.__engine is None:
+            path = getenv('HBNB_SQLITE_PATH', 'hbnb.db')
+            self.__engine = create_engine(
+                f"sqlite:///{path}",
+                poolclass=TimedQueuePool,
+                pool_size=int(getenv('HBNB_MYSQL_POOL_SIZE', 5)),
+                max_overflow=int(getenv('HBNB_MYSQL_MAX_OVERFLOW', 10)),
+                pool_timeout=float(getenv('HBNB_MYSQL_POOL_TIMEOUT', 30)),
+                connect_args={"check_same_thread": False}
+            )
+            event.listen(self.__engine, "connect", self.__connect)
+        return self.__engine
+
+    @staticmethod
+    def __connect(dbapi_connection, connection_record):
+        """Apply the pragmas to every new connection"""
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+"""
+Contains the generators of the ids given to new objects
+
+HBNB_ID_SCHEME picks the scheme: "uuid4" (the default) for random ids, or
+"uuid7" for time-ordered ones. Both are 36 character UUID strings, so
+the two kinds of ids can live in the same table.
+"""
+
+import os
+import threading
+import time
+import uuid
+import weakref
+from os import getenv
+
+_VERSION = 0x7 << 76
+_VARIANT = 0x2 << 62
+_COUNTER_MAX = 0xfff
+
+
+class UUID7Generator:
+    """makes time-ordered UUIDv7 strings, see RFC 9562
+
+    An id holds the Unix time in milliseconds, a 12 bit counter and 62
+    random bits. The counter starts from a random value below half its
+    range on every new millisecond and is incremented within one, so the
+    ids made by a generator sort in the order they were made, even when
+    the clock goes back. When the counter overflows the time is moved one
+    millisecond ahead. Random bytes are read from the system in chunks to
+    save a call per id, and batch() makes many ids under one lock. A
+    forked child starts over with fresh random bytes, so it never repeats
+    the ids of its parent or of its siblings.
+    """
+
+    def __init__(self, chunk=4096):
+        """Instantiate a UUID7Generator reading chunk random bytes at once"""
+        self.__chunk = chunk - chunk % 8
+        self.__reset()
+        if hasattr(os, "register_at_fork"):
+            reset = weakref.WeakMethod(self.__reset)
+            os.register_at_fork(
+                after_in_child=lambda: reset() and reset()())
+
+    def __reset(self):
+        """forgets the random bytes and the last id, and makes a new lock"""
+        self.__random = b""
+        self.__offset = 0
+        self.__last = 0
+        self.__counter = 0
+        self.__lock = threading.Lock()
+
+    def __call__(self):
+        """returns a new id"""
+        with self.__lock:
+            return self.__next(time.time_ns() // 1000000)
+
+    def batch(self, n):
+        """returns a list of n new ids"""
+        with self.__lock:
+            now = time.time_ns() // 1000000
+            return [self.__next(now) for _ in range(n)]
+
+    def __next(self, now):
+        """returns the id following the last one, at time now or later"""
+        rand = self.__bits()
+        if now > self.__last:
+            self.__last = now
+            self.__counter = self.__bits() >> 53
+        elif self.__counter < _COUNTER_MAX:
+            self.__counter += 1
+        else:
+            self.__last += 1
+            self.__counter = self.__bits() >> 53
+        value = (self.__last << 80 | _VERSION | self.__counter << 64 |
+                 _VARIANT | rand & 0x3fffffffffffffff)
+        hexa = "{:032x}".format(value)
+        return "{}-{}-{}-{}-{}".format(hexa[:8], hexa[8:12], hexa[12:16],
+                                       hexa[16:20], hexa[20:])
+
+    def __bits(self):
+        """returns 64 random bits from the buffered random bytes"""
+        if self.__offset == len(self.__random):
+            self.__random = os.urandom(self.__chunk)
+            self.__offset = 0
+        self.__offset += 8
+        return int.from_bytes(
+            self.__random[self.__offset - 8:self.__offset], "big")
+
+
+uuid7 = UUID7Generator()
+scheme = getenv("HBNB_ID_SCHEME", "uuid4")
+if scheme not in ("uuid4", "uuid7"):
+    raise ValueError("unknown HBNB_ID_SCHEME {!r}".format(scheme))
+
+
+def new_id():
+    """returns a new id in the HBNB_ID_SCHEME scheme"""
+    if scheme == "uuid7":
+        return uuid7()
+    return str(uuid.uuid4())
+
+
+def new_ids(n):
+    """returns a list of n new ids in the HBNB_ID_SCHEME scheme"""
+    if scheme == "uuid7":
+        return uuid7.batch(n)
+    return [str(uuid.uuid4()) for _ in range(n)]
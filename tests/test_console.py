@@ -6,6 +6,7 @@ This module contains tests for the HBNBCommand class including
 create, show, destroy, all, and update commands.
 """
 import unittest
+import models
 import os
 import sys
 from io import StringIO
@@ -52,7 +53,7 @@ class TestHBNBCommandExit(unittest.TestCase):
             self.assertTrue(HBNBCommand().onecmd("EOF"))
 
 
-@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") == "db",
+@unittest.skipIf(models.storage_t == "db",
                  "Testing file storage")
 class TestHBNBCommandCreate(unittest.TestCase):
     """Test cases for create command."""
@@ -113,7 +114,7 @@ class TestHBNBCommandCreate(unittest.TestCase):
             self.assertEqual(obj.latitude, 37.77)
 
 
-@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") == "db",
+@unittest.skipIf(models.storage_t == "db",
                  "Testing file storage")
 class TestHBNBCommandShow(unittest.TestCase):
     """Test cases for show command."""
@@ -143,7 +144,7 @@ class TestHBNBCommandShow(unittest.TestCase):
             self.assertEqual("** no instance found **\n", output.getvalue())
 
 
-@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") == "db",
+@unittest.skipIf(models.storage_t == "db",
                  "Testing file storage")
 class TestHBNBCommandDestroy(unittest.TestCase):
     """Test cases for destroy command."""
@@ -167,7 +168,7 @@ class TestHBNBCommandDestroy(unittest.TestCase):
             self.assertEqual("** instance id missing **\n", output.getvalue())
 
 
-@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") == "db",
+@unittest.skipIf(models.storage_t == "db",
                  "Testing file storage")
 class TestHBNBCommandAll(unittest.TestCase):
     """Test cases for all command."""
@@ -185,7 +186,7 @@ class TestHBNBCommandAll(unittest.TestCase):
             self.assertIn("[", output.getvalue())
 
 
-@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") == "db",
+@unittest.skipIf(models.storage_t == "db",
                  "Testing file storage")
 class TestHBNBCommandUpdate(unittest.TestCase):
     """Test cases for update command."""
@@ -0,0 +1,146 @@
+#!/usr/bin/python3
+"""
+Unit tests for the storage engine caches.
+
+This module contains tests for the LRUCache, IdentityCache and
+ResultCache classes.
+"""
+import unittest
+from unittest.mock import patch
+from models.engine.cache import IdentityCache, LRUCache, ResultCache
+from models.engine.cache import parse_limits, query_key
+
+
+class TestParseLimits(unittest.TestCase):
+    """Test cases for parse_limits."""
+
+    def test_parse_limits(self):
+        """Test that the limits are read from Class:size[:ttl] items."""
+        self.assertEqual(parse_limits("State:100:30, Amenity:50"),
+                         {"State": (100, 30.0), "Amenity": (50, None)})
+        self.assertEqual(parse_limits(""), {})
+
+
+class TestQueryKey(unittest.TestCase):
+    """Test cases for query_key."""
+
+    def test_query_key(self):
+        """Test that lists and dicts are turned into tuples."""
+        self.assertEqual(query_key({"b": 2, "a": 1}, ["name"], None),
+                         ((("a", 1), ("b", 2)), ("name",), None))
+        self.assertEqual(query_key({"a": 1}), query_key({"a": 1}))
+
+    def test_unhashable(self):
+        """Test that unhashable arguments give no key."""
+        self.assertIsNone(query_key({"a": [1]}))
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test cases for LRUCache."""
+
+    def test_get_and_put(self):
+        """Test that cached values are returned and counted."""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("b", 0), 0)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl(self):
+        """Test that entries older than ttl are dropped."""
+        cache = LRUCache(ttl=10)
+        with patch("models.engine.cache.monotonic", return_value=100):
+            cache.put("a", 1)
+        with patch("models.engine.cache.monotonic", return_value=105):
+            self.assertEqual(cache.get("a"), 1)
+        with patch("models.engine.cache.monotonic", return_value=111):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_pop_and_clear(self):
+        """Test that pop() and clear() forget entries."""
+        cache = LRUCache()
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.pop("a")
+        cache.pop("missing")
+        self.assertIsNone(cache.get("a"))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+class TestIdentityCache(unittest.TestCase):
+    """Test cases for IdentityCache."""
+
+    def test_only_listed_classes_are_cached(self):
+        """Test that objects of classes without limits are not kept."""
+        cache = IdentityCache({"State": (10, None)})
+        cache.put("State.1", "state")
+        cache.put("City.1", "city")
+        self.assertEqual(cache.get("State.1"), "state")
+        self.assertIsNone(cache.get("City.1"))
+        self.assertEqual(list(cache.stats()), ["State"])
+        self.assertTrue(cache)
+        self.assertFalse(IdentityCache())
+
+    def test_invalidate(self):
+        """Test that invalidate() and clear() forget objects."""
+        cache = IdentityCache({"State": (10, None)})
+        cache.put("State.1", "one")
+        cache.put("State.2", "two")
+        cache.invalidate("State.1")
+        cache.invalidate("City.1")
+        self.assertIsNone(cache.get("State.1"))
+        cache.clear()
+        self.assertIsNone(cache.get("State.2"))
+
+
+class TestResultCache(unittest.TestCase):
+    """Test cases for ResultCache."""
+
+    def test_get_until_bumped(self):
+        """Test that results are returned until their class changes."""
+        cache = ResultCache({"State": (10, None)})
+        cache.put("State", ("all",), ["state"], cache.version("State"))
+        self.assertEqual(cache.get("State", ("all",)), ["state"])
+        cache.bump("City")
+        self.assertEqual(cache.get("State", ("all",)), ["state"])
+        cache.bump("State")
+        self.assertIsNone(cache.get("State", ("all",)))
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_put_after_bump_is_ignored(self):
+        """Test that a result computed before a change is not kept."""
+        cache = ResultCache({"State": (10, None)})
+        version = cache.version("State")
+        cache.bump("State")
+        cache.put("State", ("all",), ["old"], version)
+        self.assertIsNone(cache.get("State", ("all",)))
+
+    def test_shared_versions(self):
+        """Test that caches sharing versions see each other's bumps."""
+        versions = {}
+        first = ResultCache({"State": (10, None)}, versions)
+        second = ResultCache(versions=versions)
+        first.put("State", ("all",), ["state"], first.version("State"))
+        second.bump("State")
+        self.assertIsNone(first.get("State", ("all",)))
+        self.assertFalse(second)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,11 +6,13 @@ This module contains comprehensive tests for the DBStorage class
 including database operations with MySQL using SQLAlchemy.
 """
 import unittest
+import models
 import os
+from unittest.mock import patch
 from models import storage
 
 
-@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") != "db",
+@unittest.skipIf(models.storage_t != "db",
                  "Testing database storage only")
 class TestDBStorageInstantiation(unittest.TestCase):
     """Test cases for DBStorage instantiation."""
@@ -21,7 +23,7 @@ class TestDBStorageInstantiation(unittest.TestCase):
         self.assertIsInstance(storage, DBStorage)
 
 
-@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") != "db",
+@unittest.skipIf(models.storage_t != "db",
                  "Testing database storage only")
 class TestDBStorageAll(unittest.TestCase):
     """Test cases for DBStorage all method."""
@@ -40,7 +42,7 @@ class TestDBStorageAll(unittest.TestCase):
             self.assertTrue(key.startswith("State."))
 
 
-@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") != "db",
+@unittest.skipIf(models.storage_t != "db",
                  "Testing database storage only")
 class TestDBStorageNew(unittest.TestCase):
     """Test cases for DBStorage new method."""
@@ -54,7 +56,7 @@ class TestDBStorageNew(unittest.TestCase):
         self.assertIn(state, storage._DBStorage__session.new)
 
 
-@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") != "db",
+@unittest.skipIf(models.storage_t != "db",
                  "Testing database storage only")
 class TestDBStorageSaveAndDelete(unittest.TestCase):
     """Test cases for DBStorage save and delete methods."""
@@ -84,5 +86,563 @@ class TestDBStorageSaveAndDelete(unittest.TestCase):
         self.assertNotIn(key, all_states)
 
 
+@unittest.skipIf(models.storage_t != "db",
+                 "Testing database storage only")
+class TestDBStorageQuery(unittest.TestCase):
+    """Test cases for DBStorage query method."""
+
+    def test_query_filters_sorts_and_pages(self):
+        """Test that query() applies where, order_by, limit and offset."""
+        from models.state import State
+        states = [State(name="QueryState{}".format(i)) for i in range(4)]
+        for state in states:
+            storage.new(state)
+        storage.save()
+        names = [state.name for state in states]
+        result = storage.query(State, order_by="-name", limit=2, offset=1)
+        self.assertEqual(len(result), 2)
+        result = storage.query("State", where={"name": names[2]})
+        self.assertEqual([state.id for state in result], [states[2].id])
+
+
+@unittest.skipIf(models.storage_t != "db",
+                 "Testing database storage only")
+class TestDBStorageIter(unittest.TestCase):
+    """Test cases for DBStorage iter method."""
+
+    def test_iter_yields_every_object(self):
+        """Test that iter() yields the same objects as all()."""
+        from models.state import State
+        storage.new(State(name="IterState"))
+        storage.save()
+        ids = {state.id for state in storage.iter(State, batch_size=2)}
+        self.assertEqual(ids, {state.id for state in
+                               storage.all(State).values()})
+
+
+@unittest.skipIf(models.storage_t != "db",
+                 "Testing database storage only")
+class TestDBStorageGetCount(unittest.TestCase):
+    """Test cases for DBStorage get and count methods."""
+
+    def test_get(self):
+        """Test that get() returns the object with that id."""
+        from models.state import State
+        state = State(name="GetState")
+        storage.new(state)
+        storage.save()
+        self.assertIs(storage.get(State, state.id), state)
+        self.assertIsNone(storage.get("State", "missing"))
+
+    def test_count(self):
+        """Test that count() matches the number of rows."""
+        from models.state import State
+        count = storage.count(State)
+        storage.new(State(name="CountState"))
+        storage.save()
+        self.assertEqual(storage.count(State), count + 1)
+        self.assertEqual(storage.count(), len(storage.all()))
+
+
+@unittest.skipIf(models.storage_t != "db",
+                 "Testing database storage only")
+class TestDBStorageConcurrentAll(unittest.TestCase):
+    """Test cases for fetching every class at once."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.workers = storage._DBStorage__workers
+        storage._DBStorage__workers = 6
+        storage.close()
+
+    def tearDown(self):
+        """Clean up after tests."""
+        storage._DBStorage__workers = self.workers
+
+    def test_all_keeps_session_objects(self):
+        """Test that all() returns the objects already in the session."""
+        from models.state import State
+        state = State(name="ConcurrentState")
+        storage.new(state)
+        storage.save()
+        self.assertIs(storage.all()["State." + state.id], state)
+
+    def test_all_sees_unsaved_objects(self):
+        """Test that all() still returns objects not flushed yet."""
+        from models.state import State
+        state = State(name="PendingState")
+        storage.new(state)
+        self.assertIn("State." + state.id, storage.all())
+        storage.save()
+
+    def test_all_runs_in_the_session(self):
+        """Test that all() never fetches on other connections."""
+        with patch("models.engine.db_storage.ThreadPoolExecutor") as pool:
+            storage.all()
+        pool.assert_not_called()
+
+    def test_rows_match_all(self):
+        """Test that rows() returns one plain row per object."""
+        from models.state import State
+        rows = storage.rows()
+        self.assertEqual(set(rows), set(storage.all()))
+        for key, row in storage.rows(State).items():
+            self.assertEqual(key, "State." + row.id)
+            self.assertTrue(hasattr(row, "name"))
+
+
+@unittest.skipIf(models.storage_t != "db",
+                 "Testing database storage only")
+class TestDBStorageBulk(unittest.TestCase):
+    """Test cases for DBStorage bulk_new and bulk_save methods."""
+
+    def test_bulk_save_inserts_in_chunks(self):
+        """Test that bulk_save() inserts every queued object."""
+        from models.state import State
+        from models.city import City
+        state = State(name="BulkState")
+        cities = [City(name="BulkCity{}".format(i), state_id=state.id)
+                  for i in range(5)]
+        storage.bulk_new(cities + [state])
+        storage.bulk_save(chunk_size=2)
+        self.assertEqual(len(storage.query(City, where={
+            "state_id": state.id})), 5)
+
+    def test_bulk_saved_objects_can_be_updated(self):
+        """Test that bulk saved objects are tracked by the session."""
+        from models.state import State
+        state = State(name="BulkState")
+        storage.bulk_new([state])
+        storage.bulk_save()
+        state.name = "BulkRenamed"
+        state.save()
+        self.assertIs(storage.get(State, state.id), state)
+        self.assertEqual(storage.rows(State)["State." + state.id].name,
+                         "BulkRenamed")
+
+
+@unittest.skipIf(models.storage_t != "db",
+                 "Testing database storage only")
+class TestDBStoragePoolStats(unittest.TestCase):
+    """Test cases for DBStorage pool_stats method."""
+
+    def test_pool_stats_count_checkouts(self):
+        """Test that queries show up in the pool counters."""
+        from models.state import State
+        before = storage.pool_stats()
+        storage.close()
+        storage.reload()
+        storage.count(State)
+        after = storage.pool_stats()
+        self.assertGreater(after["checkouts"], before["checkouts"])
+        for name in ("size", "overflow", "wait_time", "invalidations"):
+            self.assertIn(name, after)
+
+
+@unittest.skipIf(models.storage_t != "db",
+                 "Testing database storage only")
+class TestDBStorageEagerLoading(unittest.TestCase):
+    """Test cases for loading relationships ahead of use."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        from sqlalchemy import event
+        from models.state import State
+        from models.city import City
+        self.state = State(name="EagerState")
+        storage.new(self.state)
+        for i in range(3):
+            storage.new(City(name="EagerCity{}".format(i),
+                             state_id=self.state.id))
+        storage.save()
+        storage.close()
+        storage.reload()
+        self.statements = []
+        self.engine = storage._DBStorage__engine
+        event.listen(self.engine, "before_cursor_execute", self.count)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        from sqlalchemy import event
+        event.remove(self.engine, "before_cursor_execute", self.count)
+
+    def count(self, conn, cursor, statement, *args):
+        """records every statement sent to the database"""
+        self.statements.append(statement)
+
+    def test_query_load(self):
+        """Test that query(load=...) needs no query per parent."""
+        from models.state import State
+        for strategy in ("selectin", "joined"):
+            storage.close()
+            storage.reload()
+            states = storage.query(State, where={"id": self.state.id},
+                                   load={"cities": strategy})
+            before = len(self.statements)
+            self.assertEqual(len(states[0].cities), 3)
+            self.assertEqual(len(self.statements), before)
+
+    def test_query_load_rejects_unknown_strategy(self):
+        """Test that an unknown loading strategy raises ValueError."""
+        from models.state import State
+        with self.assertRaises(ValueError):
+            storage.query(State, load={"cities": "lazy"})
+
+    def test_prefetch(self):
+        """Test that prefetch() loads loaded objects' relationships."""
+        from models.state import State
+        states = list(storage.all(State).values())
+        before = len(self.statements)
+        self.assertEqual(storage.prefetch(states, "cities.places"), states)
+        self.assertEqual(len(self.statements), before + 3)
+        for state in states:
+            for city in state.cities:
+                city.places
+        self.assertEqual(len(self.statements), before + 3)
+
+
+@unittest.skipIf(models.storage_t != "db",
+                 "Testing database storage only")
+class TestDBStorageReplicas(unittest.TestCase):
+    """Test cases for routing reads to replicas, on SQLite files."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        import tempfile
+        from sqlalchemy import create_engine
+        from models.base_model import Base
+        from models.engine.db_storage import DBStorage
+
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp = self.tmp.name
+
+        class SQLiteFiles(DBStorage):
+            """DBStorage with one SQLite file per host"""
+
+            def _create_engine(self, host):
+                """Create the engine of the SQLite file named host"""
+                return create_engine("sqlite:///{}/{}.db".format(tmp, host))
+
+        env = {"HBNB_MYSQL_HOST": "primary", "HBNB_ENV": "",
+               "HBNB_MYSQL_REPLICA_HOSTS": "replica1,replica2"}
+        with patch.dict(os.environ, env):
+            self.storage = SQLiteFiles()
+        self.storage.reload()
+        self.engines = {}
+        for host in ("primary", "replica1", "replica2"):
+            self.engines[host] = create_engine(
+                "sqlite:///{}/{}.db".format(tmp, host))
+            Base.metadata.create_all(self.engines[host])
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.storage.close()
+        for engine in self.engines.values():
+            engine.dispose()
+        self.tmp.cleanup()
+
+    def replicate(self, host, state):
+        """copies state into the database of host"""
+        from sqlalchemy.orm import Session
+        from models.state import State
+        with Session(self.engines[host]) as session:
+            session.add(State(id=state.id, name=state.name))
+            session.commit()
+
+    def test_writes_go_to_primary(self):
+        """Test that saved objects land in the primary only."""
+        from models.state import State
+        state = State(name="Primary")
+        self.storage.new(state)
+        self.storage.save()
+        for host, count in (("primary", 1), ("replica1", 0)):
+            with self.engines[host].connect() as conn:
+                self.assertEqual(conn.exec_driver_sql(
+                    "SELECT COUNT(*) FROM states").scalar(), count)
+
+    def test_reads_go_to_replicas_in_turn(self):
+        """Test that a fresh session reads from each replica in turn."""
+        from models.state import State
+        state = State(name="Replicated")
+        self.replicate("replica1", state)
+        counts = [self.storage.count(State) for _ in range(4)]
+        self.assertEqual(sorted(counts), [0, 0, 1, 1])
+
+    def test_read_your_writes(self):
+        """Test that a session reads from the primary once it wrote."""
+        from models.state import State
+        self.storage.new(State(name="Mine"))
+        self.storage.save()
+        self.assertEqual([self.storage.count(State) for _ in range(2)],
+                         [1, 1])
+        self.storage.close()
+        self.assertEqual([self.storage.count(State) for _ in range(2)],
+                         [0, 0])
+
+
+@unittest.skipIf(models.storage_t != "db",
+                 "Testing database storage only")
+class TestDBStorageCache(unittest.TestCase):
+    """Test cases for the DBStorage identity cache."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        from models.engine.cache import IdentityCache
+        from models.state import State
+        self.cache = storage._DBStorage__cache
+        storage._DBStorage__cache = IdentityCache({"State": (10, None)})
+        storage.close()
+        storage.reload()
+        self.state = State(name="CachedState")
+        storage.new(self.state)
+        storage.save()
+        storage.close()
+
+    def tearDown(self):
+        """Clean up after tests."""
+        storage._DBStorage__cache = self.cache
+        storage.close()
+        storage.reload()
+
+    def test_get_uses_cache(self):
+        """Test that a second get() is answered from the cache."""
+        from models.state import State
+        self.assertIsNotNone(storage.get(State, self.state.id))
+        storage.close()
+        state = storage.get(State, self.state.id)
+        self.assertEqual(state.name, "CachedState")
+        self.assertIn(state, storage._DBStorage__session)
+        stats = storage.cache_stats()["State"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_save_invalidates(self):
+        """Test that saving a change drops the cached object."""
+        from models.state import State
+        storage.get(State, self.state.id).name = "Renamed"
+        storage.save()
+        storage.close()
+        self.assertEqual(storage.get(State, self.state.id).name, "Renamed")
+        self.assertEqual(storage.cache_stats()["State"]["hits"], 0)
+
+    def test_delete_invalidates(self):
+        """Test that deleted objects are not returned from the cache."""
+        from models.state import State
+        storage.delete(storage.get(State, self.state.id))
+        storage.save()
+        self.assertIsNone(storage.get(State, self.state.id))
+
+    def test_get_keeps_unsaved_changes(self):
+        """Test that get() never overwrites a change not saved yet."""
+        from models.state import State
+        storage.get(State, self.state.id)
+        storage.close()
+        state = storage.get(State, self.state.id)
+        state.name = "Edited"
+        self.assertIs(storage.get(State, self.state.id), state)
+        self.assertEqual(state.name, "Edited")
+        storage.save()
+        storage.close()
+        self.assertEqual(storage.query(State, where={"id": self.state.id})[0]
+                         .name, "Edited")
+
+    def test_relationships_are_not_cached(self):
+        """Test that a cached object loads its relationships again."""
+        from models.city import City
+        from models.state import State
+        storage.new(City(name="SF", state_id=self.state.id))
+        storage.save()
+        storage.close()
+        self.assertEqual([city.name for city in storage.get(
+            State, self.state.id).cities], ["SF"])
+        storage.close()
+        storage.new(City(name="LA", state_id=self.state.id))
+        storage.save()
+        storage.close()
+        self.assertEqual(sorted(city.name for city in storage.get(
+            State, self.state.id).cities), ["LA", "SF"])
+        self.assertEqual(storage.cache_stats()["State"]["hits"], 1)
+
+
+@unittest.skipIf(models.storage_t != "db",
+                 "Testing database storage only")
+class TestDBStorageResultCache(unittest.TestCase):
+    """Test cases for caching all(cls) and query() results."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        from models.engine.cache import ResultCache
+        self.results = storage._DBStorage__results
+        storage._DBStorage__results = ResultCache({"State": (10, None)})
+        storage.close()
+        storage.reload()
+
+    def tearDown(self):
+        """Clean up after tests."""
+        storage._DBStorage__results = self.results
+        storage.close()
+        storage.reload()
+
+    def test_all_is_cached_until_save(self):
+        """Test that all(cls) is a hit until a State is saved."""
+        from models.state import State
+        first = storage.all(State)
+        storage.close()
+        self.assertEqual(set(storage.all(State)), set(first))
+        self.assertEqual(storage.cache_stats()["results"]["hits"], 1)
+        state = State(name="ResultState")
+        storage.new(state)
+        storage.save()
+        self.assertIn("State." + state.id, storage.all(State))
+
+    def test_query_is_cached(self):
+        """Test that identical queries are hits, others are misses."""
+        from models.state import State
+        storage.query(State, where={"name": "Nowhere"}, limit=1)
+        storage.query(State, where={"name": "Nowhere"}, limit=1)
+        storage.query(State, where={"name": "Nowhere"}, limit=2)
+        stats = storage.cache_stats()["results"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_all_keeps_unsaved_changes(self):
+        """Test that a hit never overwrites a change not saved yet."""
+        from models.state import State
+        state = State(name="ResultState")
+        storage.new(state)
+        storage.save()
+        storage.close()
+        key = "State." + state.id
+        storage.all(State)
+        storage.close()
+        storage.all(State)[key].name = "Edited"
+        self.assertEqual(storage.all(State)[key].name, "Edited")
+        storage.save()
+        storage.close()
+        self.assertEqual(storage.get(State, state.id).name, "Edited")
+
+    def test_all_returns_pending_objects(self):
+        """Test that objects not flushed yet are returned."""
+        from models.city import City
+        from models.engine.cache import ResultCache
+        from models.state import State
+        storage._DBStorage__results = ResultCache({"City": (10, None)})
+        state = State(name="ResultState")
+        storage.new(state)
+        storage.save()
+        storage.close()
+        before = len(storage.all(City))
+        storage.close()
+        state = storage.get(State, state.id)
+        state.cities.append(City(name="Pending"))
+        self.assertEqual(len(storage.all(City)), before + 1)
+        storage.save()
+
+    def test_relationships_are_not_cached(self):
+        """Test that cached results load their relationships again."""
+        from models.city import City
+        from models.state import State
+        state = State(name="ResultState")
+        storage.new(state)
+        storage.new(City(name="SF", state_id=state.id))
+        storage.save()
+        storage.close()
+        key = "State." + state.id
+        self.assertEqual([city.name for city in storage.all(State)[key]
+                          .cities], ["SF"])
+        storage.query(State, where={"id": state.id}, load="cities")
+        storage.close()
+        storage.new(City(name="LA", state_id=state.id))
+        storage.save()
+        storage.close()
+        self.assertEqual(sorted(city.name for city in storage.all(State)[key]
+                                .cities), ["LA", "SF"])
+        self.assertEqual(storage.cache_stats()["results"]["hits"], 1)
+        storage.close()
+        found, = storage.query(State, where={"id": state.id}, load="cities")
+        self.assertEqual(sorted(city.name for city in found.cities),
+                         ["LA", "SF"])
+        self.assertEqual(storage.cache_stats()["results"]["hits"], 1)
+
+
+@unittest.skipIf(models.storage_t != "db",
+                 "Testing database storage only")
+class TestDBStorageEvents(unittest.TestCase):
+    """Test cases for the DBStorage change events."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.events = []
+        for kind in ("new", "save", "delete", "reload"):
+            storage.events.subscribe(kind, self.events.append)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        for kind in ("new", "save", "delete", "reload"):
+            storage.events.unsubscribe(kind, self.events.append)
+
+    def test_new_save_delete(self):
+        """Test that new(), save() and delete() send their events."""
+        from models.state import State
+        state = State(name="EventState")
+        storage.new(state)
+        storage.save()
+        storage.delete(state)
+        storage.save()
+        self.assertEqual([(event.kind, event.id) for event in self.events],
+                         [("new", state.id), ("save", state.id),
+                          ("delete", state.id)])
+
+    def test_save_reports_changes(self):
+        """Test that save events carry the old and new values."""
+        from models.state import State
+        state = State(name="EventState")
+        storage.new(state)
+        storage.save()
+        del self.events[:]
+        state.name = "EventRenamed"
+        storage.save()
+        event, = self.events
+        self.assertEqual(event.changes, {"name": "EventRenamed"})
+        self.assertEqual(event.old, {"name": "EventState"})
+
+    def test_rollback_drops_save_events(self):
+        """Test that changes rolled back are never reported as saved."""
+        from models.state import State
+        storage.new(State(name="EventState"))
+        storage._DBStorage__session.flush()
+        storage._DBStorage__session.rollback()
+        storage.save()
+        self.assertEqual([event.kind for event in self.events], ["new"])
+
+    def test_reload(self):
+        """Test that reload() sends a reload event."""
+        storage.close()
+        storage.reload()
+        self.assertEqual([event.kind for event in self.events], ["reload"])
+
+
+@unittest.skipIf(models.storage_t != "db",
+                 "Testing database storage only")
+class TestDBStorageIndexes(unittest.TestCase):
+    """Test cases for the indexes declared by the models."""
+
+    def test_declared_indexes(self):
+        """Test that foreign keys and sorted columns are indexed."""
+        from models.base_model import Base
+        indexes = {tuple(column.name for column in index.columns)
+                   for table in Base.metadata.tables.values()
+                   for index in table.indexes}
+        for columns in [("state_id", "name"), ("city_id", "price_by_night"),
+                        ("user_id",), ("place_id", "created_at"),
+                        ("amenity_id",), ("updated_at",), ("name",)]:
+            self.assertIn(columns, indexes)
+
+    def test_index_report(self):
+        """Test that the created schema has every declared index."""
+        report = storage.index_report()
+        self.assertEqual(report["missing"], [])
+        self.assertEqual(report["unindexed"], [])
+        self.assertEqual(report["create"], [])
+
+
 if __name__ == "__main__":
     unittest.main()
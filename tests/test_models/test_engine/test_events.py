@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+"""
+Unit tests for the storage change events.
+
+This module contains tests for the Event tuple and the EventBus class.
+"""
+import threading
+import unittest
+from io import StringIO
+from unittest.mock import patch
+from models.engine.events import Event, EventBus
+
+
+class TestEvent(unittest.TestCase):
+    """Test cases for Event."""
+
+    def test_defaults(self):
+        """Test that only the kind is required."""
+        event = Event("reload")
+        self.assertEqual(event.kind, "reload")
+        self.assertIsNone(event.cls)
+        self.assertIsNone(event.changes)
+
+
+class TestEventBus(unittest.TestCase):
+    """Test cases for EventBus."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.bus = EventBus()
+        self.events = []
+
+    def test_inactive_without_handlers(self):
+        """Test that a bus is only active while it has handlers."""
+        self.assertFalse(self.bus.active)
+        self.bus.on_save(self.events.append)
+        self.assertTrue(self.bus.active)
+        self.bus.unsubscribe("save", self.events.append)
+        self.assertFalse(self.bus.active)
+
+    def test_handlers_get_their_kind(self):
+        """Test that handlers only get the events of their kind."""
+        self.bus.on_new(self.events.append)
+        self.bus.emit(Event("new", "State", "1"))
+        self.bus.emit(Event("delete", "State", "1"))
+        self.assertEqual(self.events, [Event("new", "State", "1")])
+
+    def test_subscribe_as_decorator(self):
+        """Test that subscribing returns the handler."""
+        @self.bus.on_delete
+        def handler(event):
+            self.events.append(event)
+        self.bus.emit(Event("delete"))
+        self.assertTrue(callable(handler))
+        self.assertEqual(self.events, [Event("delete")])
+
+    def test_unknown_kind(self):
+        """Test that subscribing to an unknown kind raises ValueError."""
+        with self.assertRaises(ValueError):
+            self.bus.subscribe("update", self.events.append)
+
+    def test_failing_handler(self):
+        """Test that a failing handler does not stop the others."""
+        self.bus.on_new(lambda event: 1 / 0)
+        self.bus.on_new(self.events.append)
+        with patch("sys.stderr", new_callable=StringIO) as err:
+            self.bus.emit(Event("new"))
+        self.assertIn("ZeroDivisionError", err.getvalue())
+        self.assertEqual(len(self.events), 1)
+
+    def test_asynchronous_handlers(self):
+        """Test that asynchronous handlers run in another thread."""
+        threads = []
+        self.bus.on_reload(lambda event: threads.append(
+            threading.current_thread()), asynchronous=True)
+        self.bus.emit(Event("reload"))
+        self.bus.join()
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+
+if __name__ == "__main__":
+    unittest.main()
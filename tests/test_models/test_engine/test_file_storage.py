@@ -6,9 +6,19 @@ This module contains comprehensive tests for the FileStorage class
 including save, reload, all, new, and delete operations.
 """
 import unittest
+import models
 import os
 import json
-from models.engine.file_storage import FileStorage
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest.mock import patch
+from models.engine.events import Event
+from models.engine.file_storage import FileStorage, _Scanner
 from models.base_model import BaseModel
 from models.user import User
 from models.state import State
@@ -18,7 +28,7 @@ from models.amenity import Amenity
 from models.review import Review
 
 
-@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") == "db",
+@unittest.skipIf(models.storage_t == "db",
                  "Testing file storage")
 class TestFileStorageInstantiation(unittest.TestCase):
     """Test cases for FileStorage instantiation."""
@@ -37,7 +47,7 @@ class TestFileStorageInstantiation(unittest.TestCase):
         self.assertEqual(dict, type(FileStorage._FileStorage__objects))
 
 
-@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") == "db",
+@unittest.skipIf(models.storage_t == "db",
                  "Testing file storage")
 class TestFileStorageAll(unittest.TestCase):
     """Test cases for FileStorage all method."""
@@ -69,8 +79,29 @@ class TestFileStorageAll(unittest.TestCase):
         result = self.storage.all()
         self.assertEqual(len(result), 2)
 
+    def test_all_with_class_name_filter(self):
+        """Test that all(cls) accepts the class name."""
+        state = State()
+        self.storage.new(state)
+        self.storage.new(User())
+        result = self.storage.all("State")
+        self.assertEqual(list(result), ["State.{}".format(state.id)])
+
+    def test_all_with_class_filter_after_delete(self):
+        """Test that all(cls) no longer returns deleted objects."""
+        state = State()
+        self.storage.new(state)
+        self.storage.delete(state)
+        self.assertEqual(self.storage.all(State), {})
 
-@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") == "db",
+    def test_all_with_class_filter_after_objects_reset(self):
+        """Test that all(cls) follows a replaced __objects dict."""
+        self.storage.new(State())
+        FileStorage._FileStorage__objects = {}
+        self.assertEqual(self.storage.all(State), {})
+
+
+@unittest.skipIf(models.storage_t == "db",
                  "Testing file storage")
 class TestFileStorageNew(unittest.TestCase):
     """Test cases for FileStorage new method."""
@@ -94,7 +125,7 @@ class TestFileStorageNew(unittest.TestCase):
         self.assertEqual(len(FileStorage._FileStorage__objects), initial_count)
 
 
-@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") == "db",
+@unittest.skipIf(models.storage_t == "db",
                  "Testing file storage")
 class TestFileStorageSave(unittest.TestCase):
     """Test cases for FileStorage save method."""
@@ -129,7 +160,65 @@ class TestFileStorageSave(unittest.TestCase):
         self.assertIsInstance(data, dict)
 
 
-@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") == "db",
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStorageDirtyTracking(unittest.TestCase):
+    """Test cases for the reuse of serialized clean objects."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.storage = FileStorage()
+        FileStorage._FileStorage__objects = {}
+        self.test_file = "file.json"
+        self.state = State(name="California")
+        self.user = User(email="a@b.c")
+        self.storage.new(self.state)
+        self.storage.new(self.user)
+        self.storage.save()
+
+    def tearDown(self):
+        """Clean up after tests."""
+        try:
+            os.remove(self.test_file)
+        except FileNotFoundError:
+            pass
+
+    def test_save_skips_clean_objects(self):
+        """Test that clean objects are not serialized again."""
+        with patch.object(State, "to_dict") as to_dict:
+            self.storage.save()
+        to_dict.assert_not_called()
+
+    def test_attribute_write_marks_dirty(self):
+        """Test that assigning an attribute reserializes the object."""
+        self.state.name = "Nevada"
+        with patch.object(User, "to_dict") as to_dict:
+            self.storage.save()
+        to_dict.assert_not_called()
+        with open(self.test_file, "r") as f:
+            data = json.load(f)
+        self.assertEqual(data["State." + self.state.id]["name"], "Nevada")
+
+    def test_model_save_marks_dirty(self):
+        """Test that BaseModel.save() writes the new updated_at."""
+        self.state.save()
+        with open(self.test_file, "r") as f:
+            data = json.load(f)
+        self.assertEqual(data["State." + self.state.id]["updated_at"],
+                         self.state.to_dict()["updated_at"])
+
+    def test_building_objects_reports_nothing(self):
+        """Test that new and reloaded objects are not reported as changed."""
+        with patch.object(FileStorage, "changed") as changed:
+            State(name="Nevada", code="NV")
+            self.storage.reload()
+        changed.assert_not_called()
+        key = "State." + self.state.id
+        self.storage.all()[key].name = "Nevada"
+        self.assertIn(key, FileStorage._FileStorage__dirty)
+
+
+@unittest.skipIf(models.storage_t == "db",
                  "Testing file storage")
 class TestFileStorageDelete(unittest.TestCase):
     """Test cases for FileStorage delete method."""
@@ -157,7 +246,7 @@ class TestFileStorageDelete(unittest.TestCase):
         self.assertEqual(len(FileStorage._FileStorage__objects), initial_count)
 
 
-@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") == "db",
+@unittest.skipIf(models.storage_t == "db",
                  "Testing file storage")
 class TestFileStorageReload(unittest.TestCase):
     """Test cases for FileStorage reload method."""
@@ -196,5 +285,979 @@ class TestFileStorageReload(unittest.TestCase):
         self.assertIn(key, FileStorage._FileStorage__objects)
 
 
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStorageJournal(unittest.TestCase):
+    """Test cases for the journaled FileStorage mode."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        with patch.dict(os.environ, {"HBNB_FILE_JOURNAL": "1"}):
+            self.storage = FileStorage()
+        FileStorage._FileStorage__objects = {}
+        self.test_file = "file.json"
+
+    def tearDown(self):
+        """Clean up after tests."""
+        for name in (self.test_file, self.storage.journal_path):
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+
+    def test_save_appends_to_log(self):
+        """Test that save() appends records instead of rewriting."""
+        state = State(name="California")
+        self.storage.new(state)
+        self.storage.save()
+        self.assertFalse(os.path.exists(self.test_file))
+        with open(self.storage.journal_path, "r") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(records[0]["k"], "State.{}".format(state.id))
+        self.assertEqual(records[0]["v"]["name"], "California")
+
+    def test_reload_replays_log(self):
+        """Test that reload() replays new and deleted objects."""
+        kept = State(name="Kept")
+        gone = State(name="Gone")
+        self.storage.new(kept)
+        self.storage.new(gone)
+        self.storage.save()
+        self.storage.delete(gone)
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        objects = FileStorage._FileStorage__objects
+        self.assertIn("State.{}".format(kept.id), objects)
+        self.assertNotIn("State.{}".format(gone.id), objects)
+
+    def test_compaction_folds_log_into_snapshot(self):
+        """Test that a log past the threshold is compacted."""
+        self.storage._FileStorage__journal_max = 0
+        state = State(name="Compacted")
+        self.storage.new(state)
+        self.storage.save()
+        self.assertEqual(os.path.getsize(self.storage.journal_path), 0)
+        with open(self.test_file, "r") as f:
+            data = json.load(f)
+        self.assertIn("State.{}".format(state.id), data)
+
+
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStorageRelated(unittest.TestCase):
+    """Test cases for the FileStorage reverse indexes."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.storage = FileStorage()
+        FileStorage._FileStorage__objects = {}
+        self.state = State(name="California")
+        self.storage.new(self.state)
+
+    def test_related_returns_children(self):
+        """Test that related() returns the objects pointing at an id."""
+        city = City(state_id=self.state.id, name="Fremont")
+        self.storage.new(city)
+        self.storage.new(City(state_id="other", name="Reno"))
+        self.assertEqual(self.storage.related(City, "state_id",
+                                              self.state.id), [city])
+
+    def test_related_follows_attribute_updates(self):
+        """Test that changing a foreign key moves the object."""
+        city = City(state_id="other", name="Fremont")
+        self.storage.new(city)
+        city.state_id = self.state.id
+        self.assertEqual(self.state.cities, [city])
+        self.assertEqual(self.storage.related(City, "state_id", "other"), [])
+
+    def test_related_after_delete(self):
+        """Test that deleted objects leave the reverse index."""
+        review = Review(place_id="place", user_id="user")
+        self.storage.new(review)
+        self.storage.delete(review)
+        self.assertEqual(self.storage.related(Review, "place_id",
+                                              "place"), [])
+
+    def test_related_without_index(self):
+        """Test that related() scans attributes that are not indexed."""
+        self.assertEqual(self.storage.related(State, "name", "California"),
+                         [self.state])
+
+
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStorageStreaming(unittest.TestCase):
+    """Test cases for the streaming reload and the jsonl format."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        FileStorage._FileStorage__objects = {}
+        self.test_file = "file.json"
+
+    def tearDown(self):
+        """Clean up after tests."""
+        try:
+            os.remove(self.test_file)
+        except FileNotFoundError:
+            pass
+
+    def test_scanner_reads_across_chunks(self):
+        """Test that records split across reads are decoded whole."""
+        data = {"State.1": {"__class__": "State", "id": "1",
+                            "name": "a\\\"}, b"},
+                "City.2": {"__class__": "City", "id": "2", "name": "c"}}
+        scanner = _Scanner(StringIO(json.dumps(data, indent=2)), size=3)
+        self.assertEqual(dict(scanner.records()), data)
+
+    def test_scanner_reads_json_lines(self):
+        """Test that one record per line is keyed by class and id."""
+        lines = '{"__class__": "State", "id": "1"}\n' \
+                '{"__class__": "City", "id": "2"}\n'
+        keys = [key for key, _ in _Scanner(StringIO(lines)).records()]
+        self.assertEqual(keys, ["State.1", "City.2"])
+
+    def test_jsonl_round_trip(self):
+        """Test that the jsonl format writes one object per line."""
+        with patch.dict(os.environ, {"HBNB_FILE_FORMAT": "jsonl"}):
+            storage = FileStorage()
+        state = State(name="California")
+        storage.new(state)
+        storage.new(City(state_id=state.id, name="Fremont"))
+        storage.save()
+        with open(self.test_file, "r") as f:
+            self.assertEqual(len(f.readlines()), 2)
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        self.assertEqual(len(storage.all(City)), 1)
+        self.assertEqual(len(storage.all(State)["State." + state.id].cities),
+                         1)
+
+
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStorageLazy(unittest.TestCase):
+    """Test cases for the lazy hydration mode."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        with patch.dict(os.environ, {"HBNB_FILE_LAZY": "1"}):
+            self.storage = FileStorage()
+        FileStorage._FileStorage__objects = {}
+        self.test_file = "file.json"
+        self.state = State(name="California")
+        self.city = City(state_id=self.state.id, name="Fremont")
+        self.user = User(email="a@b.c")
+        for obj in (self.state, self.city, self.user):
+            self.storage.new(obj)
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+
+    def tearDown(self):
+        """Clean up after tests."""
+        try:
+            os.remove(self.test_file)
+        except FileNotFoundError:
+            pass
+
+    def test_reload_builds_no_objects(self):
+        """Test that reload() keeps records without building objects."""
+        self.assertEqual(FileStorage._FileStorage__objects, {})
+
+    def test_all_with_class_builds_that_class(self):
+        """Test that all(cls) only builds objects of that class."""
+        states = self.storage.all(State)
+        self.assertIsInstance(states["State." + self.state.id], State)
+        self.assertEqual(list(FileStorage._FileStorage__objects),
+                         ["State." + self.state.id])
+
+    def test_get_builds_one_object(self):
+        """Test that get() only builds the object asked for."""
+        user = self.storage.get(User, self.user.id)
+        self.assertEqual(user.email, "a@b.c")
+        self.assertEqual(list(FileStorage._FileStorage__objects),
+                         ["User." + self.user.id])
+
+    def test_count_builds_no_objects(self):
+        """Test that count() counts the records without building them."""
+        self.assertEqual(self.storage.count(), 3)
+        self.assertEqual(self.storage.count(City), 1)
+        self.assertEqual(FileStorage._FileStorage__objects, {})
+
+    def test_query_load_builds_related_objects(self):
+        """Test that query(load=...) builds the objects along the path."""
+        states = self.storage.query(State, load="cities")
+        self.assertEqual(states[0].id, self.state.id)
+        self.assertEqual(sorted(FileStorage._FileStorage__objects),
+                         sorted(["State." + self.state.id,
+                                 "City." + self.city.id]))
+
+    def test_iter_builds_objects_batch_by_batch(self):
+        """Test that iter() only builds the objects it reached."""
+        objs = self.storage.iter(batch_size=1)
+        first = next(objs)
+        self.assertEqual(list(FileStorage._FileStorage__objects),
+                         [first.__class__.__name__ + "." + first.id])
+        self.assertEqual(len(list(objs)), 2)
+
+    def test_relationship_builds_children(self):
+        """Test that relationship getters build the related objects."""
+        state = self.storage.all(State)["State." + self.state.id]
+        self.assertEqual([city.name for city in state.cities], ["Fremont"])
+        self.assertNotIn("User." + self.user.id,
+                         FileStorage._FileStorage__objects)
+
+    def test_all_builds_everything(self):
+        """Test that all() builds every stored object."""
+        self.assertEqual(len(self.storage.all()), 3)
+
+    def test_save_keeps_unbuilt_records(self):
+        """Test that save() writes records that were never built."""
+        self.storage.all(State)
+        self.storage.save()
+        with open(self.test_file, "r") as f:
+            data = json.load(f)
+        self.assertEqual(len(data), 3)
+
+
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStorageSharded(unittest.TestCase):
+    """Test cases for the sharded on-disk layout."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.mkdtemp()
+        self.patcher = patch.object(FileStorage, "_FileStorage__file_path",
+                                    os.path.join(self.tmp, "file.json"))
+        self.patcher.start()
+        self.storage = self.make_storage()
+        FileStorage._FileStorage__objects = {}
+        self.state = State(name="California")
+        self.city = City(state_id=self.state.id, name="Fremont")
+        self.storage.new(self.state)
+        self.storage.new(self.city)
+        self.storage.save()
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.patcher.stop()
+        shutil.rmtree(self.tmp)
+        FileStorage._FileStorage__objects = {}
+
+    def make_storage(self, **env):
+        """returns a FileStorage using the sharded layout"""
+        env.setdefault("HBNB_FILE_LAYOUT", "sharded")
+        with patch.dict(os.environ, env):
+            return FileStorage()
+
+    def test_save_writes_one_file_per_class(self):
+        """Test that save() writes a shard file per class."""
+        self.assertEqual(sorted(os.listdir(self.storage.shard_dir)),
+                         ["City.json", "State.json"])
+
+    def test_save_rewrites_only_dirty_shards(self):
+        """Test that clean shards are left untouched."""
+        os.remove(os.path.join(self.storage.shard_dir, "City.json"))
+        self.state.name = "Nevada"
+        self.storage.save()
+        self.assertEqual(os.listdir(self.storage.shard_dir), ["State.json"])
+
+    def test_delete_removes_empty_shard(self):
+        """Test that deleting the last object removes its shard."""
+        self.storage.delete(self.city)
+        self.storage.save()
+        self.assertEqual(os.listdir(self.storage.shard_dir), ["State.json"])
+
+    def test_reload_single_class(self):
+        """Test that reload(cls) only loads the requested class."""
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload(State)
+        self.assertEqual(list(FileStorage._FileStorage__objects),
+                         ["State." + self.state.id])
+        self.assertEqual(list(self.storage.all(City)),
+                         ["City." + self.city.id])
+
+    def test_partial_load_keeps_unloaded_classes(self):
+        """Test that saving a partial load keeps other classes on disk."""
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload(State)
+        self.storage.new(City(state_id=self.state.id, name="Reno"))
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(len(self.storage.all(City)), 2)
+
+    def test_hash_partitioned_shards(self):
+        """Test that HBNB_FILE_SHARDS splits each class by key hash."""
+        storage = self.make_storage(HBNB_FILE_SHARDS="4")
+        for i in range(20):
+            storage.new(Review(place_id=str(i)))
+        FileStorage._FileStorage__reshard = True
+        storage.save()
+        files = os.listdir(storage.shard_dir)
+        self.assertNotIn("State.json", files)
+        self.assertTrue(all(name.split(".")[1] in "0123" for name in files))
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        self.assertEqual(len(storage.all(Review)), 20)
+        self.assertEqual(len(storage.all(City)), 1)
+
+    def test_shard_count_change_rewrites_everything(self):
+        """Test that shards written with another count are replaced."""
+        storage = self.make_storage(HBNB_FILE_SHARDS="2")
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        storage.new(State(name="Nevada"))
+        storage.save()
+        names = {name.split(".")[0] for name in
+                 os.listdir(storage.shard_dir)}
+        self.assertEqual(names, {"City", "State"})
+        self.assertNotIn("State.json", os.listdir(storage.shard_dir))
+
+
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStorageDurability(unittest.TestCase):
+    """Test cases for atomic saves and group commit."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.mkdtemp()
+        self.test_file = os.path.join(self.tmp, "file.json")
+        self.patcher = patch.object(FileStorage, "_FileStorage__file_path",
+                                    self.test_file)
+        self.patcher.start()
+        self.storage = FileStorage()
+        FileStorage._FileStorage__objects = {}
+        self.state = State(name="California")
+        self.storage.new(self.state)
+        self.storage.save()
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.patcher.stop()
+        shutil.rmtree(self.tmp)
+        FileStorage._FileStorage__objects = {}
+
+    def test_save_leaves_no_temporary_file(self):
+        """Test that save() renames its temporary file into place."""
+        self.assertEqual(os.listdir(self.tmp), ["file.json"])
+
+    def test_failed_save_keeps_previous_file(self):
+        """Test that an error while writing keeps the old store intact."""
+        self.state.name = "Nevada"
+        with patch.object(State, "to_dict", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.storage.save()
+        self.assertEqual(os.listdir(self.tmp), ["file.json"])
+        with open(self.test_file, "r") as f:
+            data = json.load(f)
+        self.assertEqual(data["State." + self.state.id]["name"],
+                         "California")
+
+    def test_failed_save_keeps_objects_dirty(self):
+        """Test that objects stay dirty when a save fails."""
+        self.state.name = "Nevada"
+        with patch.object(State, "to_dict", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.storage.save()
+        self.storage.save()
+        with open(self.test_file, "r") as f:
+            data = json.load(f)
+        self.assertEqual(data["State." + self.state.id]["name"], "Nevada")
+
+    def test_reload_reports_corrupt_file(self):
+        """Test that reload() no longer hides a corrupt store."""
+        with open(self.test_file, "w") as f:
+            f.write('{"State.1": {"__class__": "State", "id"')
+        with self.assertRaises(ValueError):
+            self.storage.reload()
+
+    def test_group_commit_coalesces_saves(self):
+        """Test that concurrent saves share one write."""
+        with patch.dict(os.environ, {"HBNB_FILE_GROUP_COMMIT_MS": "100"}):
+            storage = FileStorage()
+        writes = []
+        dump = FileStorage._FileStorage__dump
+
+        def counting_dump(this, *args):
+            writes.append(args)
+            return dump(this, *args)
+
+        threads = [threading.Thread(target=storage.save) for _ in range(8)]
+        with patch.object(FileStorage, "_FileStorage__dump", counting_dump):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertGreaterEqual(len(writes), 1)
+        self.assertLess(len(writes), 8)
+
+
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStorageWriteBehind(unittest.TestCase):
+    """Test cases for the write-behind mode."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.mkdtemp()
+        self.test_file = os.path.join(self.tmp, "file.json")
+        self.patcher = patch.object(FileStorage, "_FileStorage__file_path",
+                                    self.test_file)
+        self.patcher.start()
+        FileStorage._FileStorage__objects = {}
+        self.storage = None
+
+    def tearDown(self):
+        """Clean up after tests."""
+        if self.storage is not None:
+            self.storage._FileStorage__shutdown()
+        self.patcher.stop()
+        shutil.rmtree(self.tmp)
+        FileStorage._FileStorage__objects = {}
+
+    def make_storage(self, **env):
+        """returns a FileStorage in write-behind mode"""
+        env.update(HBNB_FILE_WRITE_BEHIND="1")
+        env.setdefault("HBNB_FILE_FLUSH_INTERVAL", "60")
+        with patch.dict(os.environ, env):
+            self.storage = FileStorage()
+        return self.storage
+
+    def test_save_does_not_write(self):
+        """Test that save() leaves the write to the flusher."""
+        storage = self.make_storage()
+        storage.new(State(name="California"))
+        storage.save()
+        self.assertFalse(os.path.exists(self.test_file))
+
+    def test_flush_writes_pending_changes(self):
+        """Test that flush() writes synchronously."""
+        storage = self.make_storage()
+        state = State(name="California")
+        storage.new(state)
+        storage.save()
+        storage.flush()
+        with open(self.test_file, "r") as f:
+            self.assertIn("State." + state.id, json.load(f))
+
+    def test_threshold_wakes_flusher(self):
+        """Test that enough dirty objects trigger a background flush."""
+        storage = self.make_storage(HBNB_FILE_FLUSH_THRESHOLD="2")
+        storage.new(State())
+        storage.new(State())
+        storage.save()
+        deadline = time.time() + 5
+        while not os.path.exists(self.test_file) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(os.path.exists(self.test_file))
+
+    def test_shutdown_flushes(self):
+        """Test that stopping the flusher writes what is left."""
+        storage = self.make_storage()
+        storage.new(State())
+        storage.save()
+        storage._FileStorage__shutdown()
+        self.assertTrue(os.path.exists(self.test_file))
+
+    def test_one_flusher_for_all_instances(self):
+        """Test that the instances share a single flusher thread."""
+        def flushers():
+            return [thread for thread in threading.enumerate()
+                    if thread.name == "FileStorage-flusher"]
+        for _ in range(5):
+            storage = self.make_storage()
+        self.assertEqual(len(flushers()), 1)
+        storage._FileStorage__shutdown()
+        self.assertEqual(flushers(), [])
+
+
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStorageThreadsafe(unittest.TestCase):
+    """Test cases for the thread-safe mode."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        with patch.dict(os.environ, {"HBNB_FILE_THREADSAFE": "1"}):
+            self.storage = FileStorage()
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        """Clean up after tests."""
+        FileStorage._FileStorage__objects = {}
+
+    def test_all_returns_snapshot(self):
+        """Test that all() can be iterated while objects are added."""
+        self.storage.new(State())
+        snapshot = self.storage.all()
+        for key in snapshot:
+            self.storage.new(State())
+        self.assertEqual(len(snapshot), 1)
+        self.assertEqual(len(self.storage.all()), 2)
+
+    def test_concurrent_writers_and_readers(self):
+        """Test that threads can add, remove and list objects at once."""
+        errors = []
+
+        def writer():
+            try:
+                for _ in range(200):
+                    state = State()
+                    self.storage.new(state)
+                    self.storage.delete(state)
+                    self.storage.new(State())
+            except Exception as exc:
+                errors.append(exc)
+
+        def reader():
+            try:
+                for _ in range(200):
+                    for obj in self.storage.all().values():
+                        obj.id
+                    self.storage.all(State)
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=writer) for _ in range(4)]
+        threads += [threading.Thread(target=reader) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.storage.all(State)), 800)
+
+
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStorageMultiProcess(unittest.TestCase):
+    """Test cases for sharing the store between processes."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.mkdtemp()
+        self.test_file = os.path.join(self.tmp, "file.json")
+        self.patcher = patch.object(FileStorage, "_FileStorage__file_path",
+                                    self.test_file)
+        self.patcher.start()
+        FileStorage._FileStorage__objects = {}
+        self.storage = self.make_storage()
+        self.state = State(name="California")
+        self.storage.new(self.state)
+        self.storage.save()
+        self.storage.reload()
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.patcher.stop()
+        shutil.rmtree(self.tmp)
+        FileStorage._FileStorage__objects = {}
+
+    def make_storage(self, **env):
+        """returns a FileStorage shared between processes"""
+        env.update(HBNB_FILE_SHARED="1")
+        with patch.dict(os.environ, env):
+            return FileStorage()
+
+    def other_process(self, code, **env):
+        """runs code in another process using the same store"""
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.dirname(os.path.abspath(__file__)))))
+        env = dict(os.environ, PYTHONPATH=root, HBNB_FILE_SHARED="1", **env)
+        script = "from models import storage\n" \
+                 "from models.state import State\n" + code
+        return subprocess.run([sys.executable, "-c", script], cwd=self.tmp,
+                              env=env, check=True, capture_output=True,
+                              text=True).stdout.strip()
+
+    def test_close_picks_up_other_process_changes(self):
+        """Test that close() loads objects saved by another process."""
+        new_id = self.other_process(
+            "state = State(name='Nevada')\nstate.save()\n"
+            "storage.delete(storage.all(State)['State.{}'])\n"
+            "storage.save()\nprint(state.id)".format(self.state.id))
+        self.storage.close()
+        self.assertEqual(list(self.storage.all(State)), ["State." + new_id])
+
+    def test_close_without_changes_reads_nothing(self):
+        """Test that close() does not reparse an unchanged store."""
+        scan = FileStorage._FileStorage__scan
+        with patch.object(FileStorage, "_FileStorage__scan",
+                          side_effect=scan) as scanned:
+            self.storage.close()
+        scanned.assert_not_called()
+
+    def test_close_replays_only_new_log_records(self):
+        """Test that a grown change log is replayed from where it was."""
+        storage = self.make_storage(HBNB_FILE_JOURNAL="1")
+        storage.new(State(name="Logged"))
+        storage.save()
+        size = os.path.getsize(storage.journal_path)
+        new_id = self.other_process(
+            "state = State(name='Nevada')\nstate.save()\nprint(state.id)",
+            HBNB_FILE_JOURNAL="1")
+        replay = FileStorage._FileStorage__replay
+        starts = []
+
+        def recording_replay(this, names=None, skip=(), start=0, found=None):
+            starts.append(start)
+            return replay(this, names, skip, start, found)
+
+        with patch.object(FileStorage, "_FileStorage__replay",
+                          recording_replay):
+            storage.close()
+        self.assertEqual(starts, [size])
+        self.assertIn("State." + new_id, storage.all(State))
+
+    def test_save_keeps_other_process_changes(self):
+        """Test that save() merges instead of overwriting other writes."""
+        new_id = self.other_process(
+            "state = State(name='Nevada')\nstate.save()\nprint(state.id)")
+        self.state.name = "Oregon"
+        self.storage.new(self.state)
+        self.storage.save()
+        with open(self.test_file, "r") as f:
+            data = json.load(f)
+        self.assertIn("State." + new_id, data)
+        self.assertEqual(data["State." + self.state.id]["name"], "Oregon")
+
+
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStorageQuery(unittest.TestCase):
+    """Test cases for the FileStorage query method."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.storage = FileStorage()
+        FileStorage._FileStorage__objects = {}
+        self.cities = [City(state_id="ca", name="Fremont"),
+                       City(state_id="nv", name="Reno"),
+                       City(state_id="ca", name="Berkeley"),
+                       City(state_id="ca", name="Albany")]
+        for city in self.cities:
+            self.storage.new(city)
+
+    def test_query_without_arguments(self):
+        """Test that query() returns every instance of the class."""
+        self.assertEqual(self.storage.query(City), self.cities)
+        self.assertEqual(self.storage.query(State), [])
+
+    def test_query_where(self):
+        """Test that query() keeps the objects matching every condition."""
+        result = self.storage.query("City", where={"state_id": "ca",
+                                                   "name": "Albany"})
+        self.assertEqual(result, [self.cities[3]])
+        result = self.storage.query(City, where={"name": "Reno"})
+        self.assertEqual(result, [self.cities[1]])
+
+    def test_query_where_uses_index(self):
+        """Test that indexed attributes are answered by the index."""
+        with patch.object(FileStorage, "_FileStorage__related",
+                          wraps=self.storage._FileStorage__related) as found:
+            result = self.storage.query(City, where={"state_id": "nv"})
+        found.assert_called_once_with("City", "state_id", "nv")
+        self.assertEqual(result, [self.cities[1]])
+
+    def test_query_order_by(self):
+        """Test that query() sorts on one or several attributes."""
+        names = [city.name for city in self.storage.query(
+            City, order_by="name")]
+        self.assertEqual(names, ["Albany", "Berkeley", "Fremont", "Reno"])
+        names = [city.name for city in self.storage.query(
+            City, order_by=["state_id", "-name"])]
+        self.assertEqual(names, ["Fremont", "Berkeley", "Albany", "Reno"])
+
+    def test_query_limit_and_offset(self):
+        """Test that query() returns the requested page."""
+        names = [city.name for city in self.storage.query(
+            City, order_by="-name", limit=2, offset=1)]
+        self.assertEqual(names, ["Fremont", "Berkeley"])
+        self.assertEqual(self.storage.query(City, limit=1, offset=3),
+                         [self.cities[3]])
+        self.assertEqual(self.storage.query(City, limit=0), [])
+
+    def test_query_sorts_missing_values_first(self):
+        """Test that objects without the attribute sort before others."""
+        state = State(name="Nevada")
+        self.storage.new(State(name="California", code="CA"))
+        self.storage.new(state)
+        self.assertIs(self.storage.query(State, order_by="code")[0], state)
+        self.assertIs(self.storage.query(State, order_by="-code")[1], state)
+
+
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStorageIter(unittest.TestCase):
+    """Test cases for the FileStorage iter method."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.storage = FileStorage()
+        FileStorage._FileStorage__objects = {}
+        self.states = [State(name=str(i)) for i in range(5)]
+        self.user = User()
+        for obj in self.states + [self.user]:
+            self.storage.new(obj)
+
+    def test_iter_returns_generator(self):
+        """Test that iter() yields objects lazily."""
+        objs = self.storage.iter()
+        self.assertIs(iter(objs), objs)
+        self.assertEqual(list(objs), self.states + [self.user])
+
+    def test_iter_with_class(self):
+        """Test that iter(cls) only yields instances of cls."""
+        self.assertEqual(list(self.storage.iter(State, batch_size=2)),
+                         self.states)
+        self.assertEqual(list(self.storage.iter("User")), [self.user])
+
+    def test_iter_while_deleting(self):
+        """Test that objects deleted during iteration are skipped."""
+        seen = []
+        for state in self.storage.iter(State, batch_size=2):
+            seen.append(state)
+            self.storage.delete(self.states[3])
+            self.storage.new(State())
+        self.assertEqual(seen, self.states[:3] + self.states[4:])
+
+
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStorageGetCount(unittest.TestCase):
+    """Test cases for the FileStorage get and count methods."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.storage = FileStorage()
+        FileStorage._FileStorage__objects = {}
+        self.state = State(name="California")
+        self.storage.new(self.state)
+        self.storage.new(State(name="Nevada"))
+        self.storage.new(User())
+
+    def test_get(self):
+        """Test that get() returns the object with that id."""
+        self.assertIs(self.storage.get(State, self.state.id), self.state)
+        self.assertIs(self.storage.get("State", self.state.id), self.state)
+
+    def test_get_missing(self):
+        """Test that get() returns None for unknown ids or classes."""
+        self.assertIsNone(self.storage.get(State, "missing"))
+        self.assertIsNone(self.storage.get(City, self.state.id))
+        self.assertIsNone(self.storage.get("Country", self.state.id))
+
+    def test_count(self):
+        """Test that count() counts every object or one class."""
+        self.assertEqual(self.storage.count(), 3)
+        self.assertEqual(self.storage.count(State), 2)
+        self.assertEqual(self.storage.count("User"), 1)
+        self.assertEqual(self.storage.count(City), 0)
+
+    def test_count_after_delete(self):
+        """Test that count() follows deletions."""
+        self.storage.delete(self.state)
+        self.assertEqual(self.storage.count(State), 1)
+        self.assertIsNone(self.storage.get(State, self.state.id))
+
+
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStorageBulk(unittest.TestCase):
+    """Test cases for the FileStorage bulk methods."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.mkdtemp()
+        self.test_file = os.path.join(self.tmp, "file.json")
+        self.patcher = patch.object(FileStorage, "_FileStorage__file_path",
+                                    self.test_file)
+        self.patcher.start()
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.patcher.stop()
+        shutil.rmtree(self.tmp)
+        FileStorage._FileStorage__objects = {}
+
+    def test_bulk_save_writes_once(self):
+        """Test that bulk_save() writes every bulk_new() object at once."""
+        reviews = [Review(place_id="place", text=str(i)) for i in range(50)]
+        self.storage.bulk_new(reviews)
+        self.assertEqual(self.storage.related(Review, "place_id", "place"),
+                         reviews)
+        write = FileStorage._FileStorage__write
+        with patch.object(FileStorage, "_FileStorage__write",
+                          side_effect=write, autospec=True) as written:
+            self.storage.bulk_save()
+        self.assertEqual(written.call_count, 1)
+        with open(self.test_file, "r") as f:
+            self.assertEqual(len(json.load(f)), 50)
+
+
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStoragePrefetch(unittest.TestCase):
+    """Test cases for the FileStorage prefetch method."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.storage = FileStorage()
+        FileStorage._FileStorage__objects = {}
+        self.state = State(name="California")
+        self.city = City(state_id=self.state.id, name="Fremont")
+        self.amenity = Amenity(name="Wifi")
+        self.place = Place(city_id=self.city.id)
+        self.place.amenity_ids = [self.amenity.id, "missing"]
+        for obj in (self.state, self.city, self.amenity, self.place):
+            self.storage.new(obj)
+
+    def test_prefetch_returns_objects(self):
+        """Test that prefetch() follows dotted paths and returns objs."""
+        objs = self.storage.prefetch(iter([self.state]),
+                                     "cities.places.amenities")
+        self.assertEqual(objs, [self.state])
+
+    def test_amenities_looks_up_ids(self):
+        """Test that Place.amenities skips ids that are not stored."""
+        with patch.object(self.storage, "all") as all_objects:
+            self.assertEqual(self.place.amenities, [self.amenity])
+        all_objects.assert_not_called()
+
+
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStorageResultCache(unittest.TestCase):
+    """Test cases for caching query() results."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        with patch.dict(os.environ, {"HBNB_RESULT_CACHE": "City:8"}):
+            self.storage = FileStorage()
+        FileStorage._FileStorage__objects = {}
+        self.cities = [City(state_id="ca", name=name)
+                       for name in ("Fremont", "Reno", "Albany")]
+        for city in self.cities:
+            self.storage.new(city)
+
+    def query(self):
+        """runs the cached query"""
+        return self.storage.query(City, where={"state_id": "ca"},
+                                  order_by="name")
+
+    def test_repeated_query_is_cached(self):
+        """Test that the second identical query is a hit."""
+        self.assertEqual(self.query(), self.query())
+        stats = self.storage.cache_stats()["results"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_attribute_change_invalidates(self):
+        """Test that changing an object drops the results of its class."""
+        self.query()
+        self.cities[1].name = "Berkeley"
+        self.assertEqual([city.name for city in self.query()],
+                         ["Albany", "Berkeley", "Fremont"])
+
+    def test_new_and_delete_invalidate(self):
+        """Test that new() and delete() drop the cached results."""
+        self.query()
+        city = City(state_id="ca", name="Oakland")
+        self.storage.new(city)
+        self.assertIn(city, self.query())
+        self.storage.delete(city)
+        self.assertNotIn(city, self.query())
+
+    def test_other_classes_not_invalidated(self):
+        """Test that writing another class keeps the cached results."""
+        self.query()
+        self.storage.new(State(name="California"))
+        self.query()
+        self.assertEqual(self.storage.cache_stats()["results"]["hits"], 1)
+
+    def test_reset_invalidates(self):
+        """Test that replacing the objects dict drops every result."""
+        self.query()
+        FileStorage._FileStorage__objects = {}
+        self.assertEqual(self.query(), [])
+
+
+@unittest.skipIf(models.storage_t == "db",
+                 "Testing file storage")
+class TestFileStorageEvents(unittest.TestCase):
+    """Test cases for the FileStorage change events."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.mkdtemp()
+        self.patcher = patch.object(FileStorage, "_FileStorage__file_path",
+                                    os.path.join(self.tmp, "file.json"))
+        self.patcher.start()
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.events = []
+        for kind in ("new", "save", "delete", "reload"):
+            self.storage.events.subscribe(kind, self.events.append)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        for kind in ("new", "save", "delete", "reload"):
+            self.storage.events.unsubscribe(kind, self.events.append)
+        self.patcher.stop()
+        shutil.rmtree(self.tmp)
+        FileStorage._FileStorage__objects = {}
+
+    def test_new_save_delete(self):
+        """Test that new(), save() and delete() send their events."""
+        state = State(name="California")
+        self.storage.new(state)
+        self.storage.save()
+        self.storage.delete(state)
+        self.assertEqual([(event.kind, event.cls, event.id, event.obj)
+                          for event in self.events],
+                         [("new", "State", state.id, state),
+                          ("save", "State", state.id, state),
+                          ("delete", "State", state.id, state)])
+
+    def test_save_reports_changes(self):
+        """Test that save events carry the changed attributes."""
+        city = City(state_id="old", name="Fremont")
+        self.storage.new(city)
+        self.storage.save()
+        del self.events[:]
+        city.name = "Reno"
+        city.state_id = "new"
+        self.storage.save()
+        event, = self.events
+        self.assertEqual(event.changes, {"name": "Reno", "state_id": "new"})
+        self.assertEqual(event.old, {"state_id": "old"})
+
+    def test_reload(self):
+        """Test that reload() sends one event per reloaded class."""
+        self.storage.reload()
+        self.storage.reload([City, "State"])
+        self.assertEqual(self.events, [Event("reload"),
+                                       Event("reload", "City"),
+                                       Event("reload", "State")])
+
+    def test_no_events_without_handlers(self):
+        """Test that no event is built when nobody listens."""
+        for kind in ("new", "save", "delete", "reload"):
+            self.storage.events.unsubscribe(kind, self.events.append)
+        with patch("models.engine.file_storage.Event") as event:
+            state = State()
+            self.storage.new(state)
+            state.name = "Nevada"
+            self.storage.save()
+            self.storage.delete(state)
+        event.assert_not_called()
+        self.assertEqual(FileStorage._FileStorage__changes, {})
+
+
 if __name__ == "__main__":
     unittest.main()
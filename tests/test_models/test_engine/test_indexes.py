@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+"""
+Unit tests for the index report.
+
+This module contains tests for index_report, run against an in-memory
+SQLite database with its own tables.
+"""
+import unittest
+from sqlalchemy import Column, ForeignKey, Index, Integer, MetaData, String
+from sqlalchemy import Table, create_engine
+from models.engine.indexes import index_report
+
+
+class TestIndexReport(unittest.TestCase):
+    """Test cases for index_report."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.engine = create_engine("sqlite://")
+        self.metadata = MetaData()
+        Table("states", self.metadata,
+              Column("id", String(60), primary_key=True),
+              Column("name", String(128), index=True))
+        Table("cities", self.metadata,
+              Column("id", String(60), primary_key=True),
+              Column("state_id", String(60), ForeignKey("states.id")),
+              Column("rank", Integer),
+              Index("ix_cities_state_id_rank", "state_id", "rank"))
+        self.metadata.create_all(self.engine)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.engine.dispose()
+
+    def test_matching_schema(self):
+        """Test that a schema made from the metadata has no findings."""
+        report = index_report(self.engine, self.metadata)
+        self.assertEqual(report, {"missing": [], "unindexed": [],
+                                  "undeclared": [], "unused": None,
+                                  "create": []})
+
+    def test_missing_index(self):
+        """Test that a dropped index is missing with its statement."""
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql("DROP INDEX ix_cities_state_id_rank")
+        report = index_report(self.engine, self.metadata)
+        self.assertEqual(report["missing"],
+                         [("cities", "ix_cities_state_id_rank",
+                           ("state_id", "rank"))])
+        self.assertEqual(report["unindexed"],
+                         [("cities", None, ("state_id",))])
+        self.assertEqual(report["create"],
+                         ["CREATE INDEX ix_cities_state_id_rank "
+                          "ON cities (state_id, rank)"])
+
+    def test_undeclared_index(self):
+        """Test that an index the models do not declare is reported."""
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql("CREATE INDEX ix_extra ON cities (rank)")
+        report = index_report(self.engine, self.metadata)
+        self.assertEqual(report["undeclared"],
+                         [("cities", "ix_extra", ("rank",))])
+        self.assertEqual(report["missing"], [])
+
+    def test_missing_table(self):
+        """Test that the indexes of a missing table are all missing."""
+        self.metadata.tables["cities"].drop(self.engine)
+        report = index_report(self.engine, self.metadata)
+        self.assertEqual(report["missing"],
+                         [("cities", "ix_cities_state_id_rank",
+                           ("state_id", "rank"))])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+"""
+Unit tests for the storage engine locks.
+
+This module contains tests for the RWLock readers-writer lock and the
+NoLock placeholder.
+"""
+import threading
+import time
+import unittest
+from models.engine.locks import NoLock, RWLock
+
+
+class TestRWLock(unittest.TestCase):
+    """Test cases for RWLock."""
+
+    def test_readers_share_the_lock(self):
+        """Test that several threads can read at the same time."""
+        lock = RWLock()
+        inside = []
+        barrier = threading.Barrier(3, timeout=5)
+
+        def reader():
+            with lock.reading():
+                inside.append(1)
+                barrier.wait()
+
+        threads = [threading.Thread(target=reader) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(inside), 3)
+
+    def test_writer_excludes_readers(self):
+        """Test that a reader waits for the writer to finish."""
+        lock = RWLock()
+        events = []
+        lock.acquire_write()
+
+        def reader():
+            with lock.reading():
+                events.append("read")
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        time.sleep(0.05)
+        events.append("write done")
+        lock.release_write()
+        thread.join()
+        self.assertEqual(events, ["write done", "read"])
+
+    def test_writer_can_reenter(self):
+        """Test that the writing thread may take the lock again."""
+        lock = RWLock()
+        with lock.writing():
+            with lock.writing():
+                with lock.reading():
+                    pass
+        with lock.writing():
+            pass
+
+    def test_waiting_writer_blocks_new_readers(self):
+        """Test that writers are not starved by new readers."""
+        lock = RWLock()
+        events = []
+        lock.acquire_read()
+
+        def writer():
+            with lock.writing():
+                events.append("write")
+
+        def reader():
+            with lock.reading():
+                events.append("read")
+
+        first = threading.Thread(target=writer)
+        first.start()
+        time.sleep(0.05)
+        second = threading.Thread(target=reader)
+        second.start()
+        time.sleep(0.05)
+        lock.release_read()
+        first.join()
+        second.join()
+        self.assertEqual(events, ["write", "read"])
+
+
+class TestNoLock(unittest.TestCase):
+    """Test cases for NoLock."""
+
+    def test_context_managers(self):
+        """Test that NoLock can be used like RWLock."""
+        lock = NoLock()
+        with lock.reading():
+            with lock.writing():
+                pass
+
+
+if __name__ == "__main__":
+    unittest.main()
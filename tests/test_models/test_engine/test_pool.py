@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+"""
+Unit tests for the DBStorage connection pool.
+
+This module contains tests for the TimedQueuePool counters, using an
+in-memory SQLite database in place of MySQL.
+"""
+import unittest
+from sqlalchemy import create_engine, exc, text
+from models.engine.pool import TimedQueuePool
+
+
+class TestTimedQueuePool(unittest.TestCase):
+    """Test cases for TimedQueuePool."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.engine = create_engine(
+            "sqlite://", poolclass=TimedQueuePool, pool_size=1,
+            max_overflow=1, pool_timeout=0.05,
+            connect_args={"check_same_thread": False})
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.engine.dispose()
+
+    def test_counts_checkouts(self):
+        """Test that every checkout is counted and timed."""
+        for _ in range(3):
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        stats = self.engine.pool.stats()
+        self.assertEqual(stats["checkouts"], 3)
+        self.assertGreaterEqual(stats["wait_time"], stats["max_wait"])
+        self.assertEqual(stats["checked_out"], 0)
+        self.assertEqual(stats["checked_in"], 1)
+
+    def test_counts_overflow_and_timeouts(self):
+        """Test that overflowing and exhausting the pool are counted."""
+        first = self.engine.connect()
+        second = self.engine.connect()
+        with self.assertRaises(exc.TimeoutError):
+            self.engine.connect()
+        stats = self.engine.pool.stats()
+        self.assertEqual(stats["overflow_checkouts"], 1)
+        self.assertEqual(stats["max_overflow_used"], 1)
+        self.assertEqual(stats["overflow"], 1)
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["checked_out"], 2)
+        first.close()
+        second.close()
+
+    def test_counts_invalidations(self):
+        """Test that invalidated connections are counted."""
+        with self.engine.connect() as conn:
+            conn.invalidate()
+        self.assertEqual(self.engine.pool.stats()["invalidations"], 1)
+
+    def test_recreate_keeps_counters(self):
+        """Test that the counters survive dispose()."""
+        with self.engine.connect() as conn:
+            conn.invalidate()
+        self.engine.dispose()
+        with self.engine.connect() as conn:
+            conn.invalidate()
+        stats = self.engine.pool.stats()
+        self.assertIsInstance(self.engine.pool, TimedQueuePool)
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["invalidations"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+"""
+Unit tests for the SQLiteStorage class.
+
+This module contains tests for the SQLite specific parts of the
+SQLiteStorage class; the DBStorage tests cover the rest.
+"""
+import unittest
+import os
+from models import storage
+
+
+@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") != "sqlite",
+                 "Testing SQLite storage only")
+class TestSQLiteStorage(unittest.TestCase):
+    """Test cases for SQLiteStorage."""
+
+    def pragma(self, name):
+        """returns the value of a pragma on a pooled connection"""
+        with storage._DBStorage__engine.connect() as conn:
+            return conn.exec_driver_sql("PRAGMA " + name).scalar()
+
+    def test_storage_is_sqlite_storage(self):
+        """Test that storage is SQLiteStorage when env is set."""
+        from models.engine.db_storage import DBStorage
+        from models.engine.sqlite_storage import SQLiteStorage
+        self.assertIsInstance(storage, SQLiteStorage)
+        self.assertIsInstance(storage, DBStorage)
+
+    def test_pragmas(self):
+        """Test that connections run in WAL mode with the pragmas set."""
+        self.assertEqual(self.pragma("journal_mode"), "wal")
+        self.assertEqual(self.pragma("synchronous"), 1)
+        self.assertEqual(self.pragma("foreign_keys"), 1)
+        self.assertEqual(self.pragma("busy_timeout"), 5000)
+
+    def test_foreign_keys_are_enforced(self):
+        """Test that a city of an unknown state cannot be saved."""
+        from sqlalchemy import exc
+        from models.city import City
+        storage.new(City(name="Orphan", state_id="missing"))
+        with self.assertRaises(exc.IntegrityError):
+            storage.save()
+        storage._DBStorage__session.rollback()
+
+    def test_save_and_reload(self):
+        """Test that saved objects can be read back by a new session."""
+        from models.state import State
+        state = State(name="SQLiteState")
+        storage.new(state)
+        storage.save()
+        storage.close()
+        storage.reload()
+        self.assertEqual(storage.get(State, state.id).name, "SQLiteState")
+
+
+if __name__ == "__main__":
+    unittest.main()
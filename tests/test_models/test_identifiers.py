@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+"""
+Unit tests for the id generators.
+
+This module contains tests for UUID7Generator, new_id and new_ids.
+"""
+import os
+import unittest
+import uuid
+from unittest.mock import patch
+from models import identifiers
+from models.base_model import BaseModel
+from models.identifiers import UUID7Generator
+
+
+class TestUUID7Generator(unittest.TestCase):
+    """Test cases for UUID7Generator."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.generate = UUID7Generator(chunk=64)
+
+    def test_format(self):
+        """Test that ids are version 7 UUID strings."""
+        value = uuid.UUID(self.generate())
+        self.assertEqual(value.version, 7)
+        self.assertEqual(value.variant, uuid.RFC_4122)
+        self.assertEqual(len(str(value)), 36)
+
+    def test_timestamp(self):
+        """Test that ids start with the time in milliseconds."""
+        with patch("models.identifiers.time.time_ns",
+                   return_value=1700000000123 * 1000000):
+            value = uuid.UUID(self.generate())
+        self.assertEqual(value.int >> 80, 1700000000123)
+
+    def test_ordered_and_unique(self):
+        """Test that ids sort in the order they were made."""
+        ids = self.generate.batch(5000) + [self.generate()
+                                           for _ in range(100)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_clock_going_back(self):
+        """Test that ids stay ordered when the clock goes back."""
+        with patch("models.identifiers.time.time_ns",
+                   return_value=2000 * 1000000):
+            first = self.generate()
+        with patch("models.identifiers.time.time_ns",
+                   return_value=1000 * 1000000):
+            second = self.generate()
+        self.assertLess(first, second)
+        self.assertEqual(uuid.UUID(second).int >> 80, 2000)
+
+    def test_counter_overflow(self):
+        """Test that a full counter moves the time one millisecond ahead."""
+        with patch("models.identifiers.time.time_ns",
+                   return_value=1000 * 1000000):
+            ids = self.generate.batch(4097)
+        self.assertEqual(uuid.UUID(ids[0]).int >> 80, 1000)
+        self.assertEqual(uuid.UUID(ids[-1]).int >> 80, 1001)
+        self.assertEqual(ids, sorted(ids))
+
+    @unittest.skipIf(not hasattr(os, "fork"), "Testing fork only")
+    def test_forked_children(self):
+        """Test that forked children do not repeat each other's ids."""
+        ids = []
+        with patch("models.identifiers.time.time_ns",
+                   return_value=1000 * 1000000):
+            self.generate()
+            for _ in range(2):
+                read, write = os.pipe()
+                pid = os.fork()
+                if pid == 0:
+                    os.close(read)
+                    os.write(write, self.generate().encode())
+                    os._exit(0)
+                os.close(write)
+                ids.append(os.read(read, 36).decode())
+                os.close(read)
+                os.waitpid(pid, 0)
+            ids.append(self.generate())
+        self.assertEqual(len(set(ids)), 3)
+
+
+class TestNewId(unittest.TestCase):
+    """Test cases for new_id and new_ids."""
+
+    def test_uuid4_scheme(self):
+        """Test that the uuid4 scheme makes random ids."""
+        with patch.object(identifiers, "scheme", "uuid4"):
+            self.assertEqual(uuid.UUID(identifiers.new_id()).version, 4)
+            ids = identifiers.new_ids(3)
+        self.assertEqual([uuid.UUID(id).version for id in ids], [4, 4, 4])
+
+    def test_uuid7_scheme(self):
+        """Test that the uuid7 scheme makes time-ordered ids."""
+        with patch.object(identifiers, "scheme", "uuid7"):
+            first = identifiers.new_id()
+            ids = identifiers.new_ids(3)
+        self.assertEqual(uuid.UUID(first).version, 7)
+        self.assertEqual([first] + ids, sorted([first] + ids))
+
+    def test_base_model_ids(self):
+        """Test that new models get their id from the scheme."""
+        with patch.object(identifiers, "scheme", "uuid7"):
+            first = BaseModel()
+            second = BaseModel(name="Second")
+        self.assertEqual(uuid.UUID(first.id).version, 7)
+        self.assertLess(first.id, second.id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,7 @@ This module contains comprehensive tests for the State class
 including attribute validation and relationship verification.
 """
 import unittest
+import models
 import os
 from models.state import State
 from models.base_model import BaseModel
@@ -65,7 +66,7 @@ class TestStateToDict(unittest.TestCase):
         self.assertEqual(state_dict["__class__"], "State")
 
 
-@unittest.skipIf(os.getenv("HBNB_TYPE_STORAGE") != "db",
+@unittest.skipIf(models.storage_t != "db",
                  "Testing database storage")
 class TestStateDBStorage(unittest.TestCase):
     """Test cases for State with database storage."""